@@ -36,6 +36,9 @@ bl_info = {
 if "bpy" in locals():
 	import importlib
 	importlib.reload(support)
+	importlib.reload(tre_archive)
+	importlib.reload(file_index)
+	importlib.reload(dds)
 	importlib.reload(extents)
 	importlib.reload(swg_types)
 	importlib.reload(nsg_iff)
@@ -57,6 +60,9 @@ if "bpy" in locals():
 	importlib.reload(export_sat)
 else:
 	from . import support
+	from . import tre_archive
+	from . import file_index
+	from . import dds
 	from . import extents
 	from . import swg_types
 	from . import nsg_iff
@@ -135,10 +141,17 @@ class SWGPreferences(AddonPreferences):
 		default=False,
 	)
 
+	png_dir: StringProperty(
+		name="PNG Texture Dir",
+		description="Where converted PNG textures are kept. Empty: next to the source DDS (textures from .tre archives go to Blender's user datafiles).",
+		subtype='DIR_PATH',
+	)
+
 	def draw(self, context):
 		layout = self.layout
 		layout.prop(self, "swg_root")
 		layout.prop(self, "convert_tex_to_png")
+		layout.prop(self, "png_dir")
 
 class OBJECT_OT_addon_prefs_swg(Operator):
 	"""Display SWG Preferences"""
@@ -192,6 +205,9 @@ class ImportMSH(bpy.types.Operator, ImportHelper):
 											"filepath"))
 
 			  
+		support.begin_import()
+		# Every texture of every file (and the meshes they pull in) converted in one batch
+		support.prepare_textures([os.path.join(os.path.dirname(self.filepath), f.name) for f in self.files], context.preferences.addons[__package__].preferences.swg_root)
 		for f in self.files:   
 			dirname = os.path.dirname(self.filepath)
 			filepath = os.path.join(dirname, f.name)
@@ -204,6 +220,7 @@ class ImportMSH(bpy.types.Operator, ImportHelper):
 		#	 self.report({'ERROR'}, 'Something went wrong importing MESH')
 		#	 return {'CANCELLED'}
 		
+		support.end_import()
 		return {'FINISHED'}
 
 	def draw(self, context):
@@ -316,6 +333,7 @@ class MGN_PT_import_option(bpy.types.Panel):
 		operator = sfile.active_operator
 		layout.prop(operator, "axis_forward")
 		layout.prop(operator, "axis_up")
+		layout.prop(operator, "weight_step")
 
 @orientation_helper(axis_forward='Z', axis_up='Y')
 class ImportMGN(bpy.types.Operator, ImportHelper):
@@ -329,6 +347,14 @@ class ImportMGN(bpy.types.Operator, ImportHelper):
 				default="*.mgn",
 				options={'HIDDEN'},
 		)
+	weight_step: FloatProperty(
+			name="Weight Step",
+			description="0 keeps skin weights exact. Above 0, weights are rounded to multiples of this so vertices with near equal weights are added to a vertex group together, which is faster but lossy: re-exporting won't reproduce the original weights.",
+			default=0.0,
+			min=0.0,
+			max=0.1,
+			precision=4,
+			)
 
 	def execute(self, context):
 		keywords = self.as_keywords(ignore=("axis_forward",
@@ -342,11 +368,15 @@ class ImportMGN(bpy.types.Operator, ImportHelper):
 										
 		keywords["global_matrix"] = global_matrix
 
+		support.begin_import()
+		support.prepare_textures([self.filepath], context.preferences.addons[__package__].preferences.swg_root)
 		result = import_mgn.import_mgn(context, **keywords)
 		if 'ERROR' in result:
 			self.report({'ERROR'}, 'Something went wrong importing MGN')
+			support.end_import()
 			return {'CANCELLED'}
 		
+		support.end_import()
 		return {'FINISHED'}
 
 	def draw(self, context):
@@ -363,6 +393,9 @@ class ExportMGN(bpy.types.Operator, ExportHelper):
 	filename_ext = ".mgn"
 	filter_glob: StringProperty(default="*.mgn", options={'HIDDEN'})
 	do_tangents : BoolProperty(name='DOT3', description="Include DOT3 tangent vectors.", default=True)
+	sparse_blends : BoolProperty(name='Sparse Blends', description="Only write blend deltas for vertices a shape key actually moves.", default=True)
+	blend_threshold : FloatProperty(name='Blend Threshold', description="Smallest per-axis movement that counts as moved for sparse blends.", default=0.0001, min=0.0, precision=6)
+	normal_tolerance : FloatProperty(name='Normal Tolerance', description="Normals that round to the same multiple of this on every axis share one NORM entry, written as the first of them. Normals either side of a rounding boundary are kept apart.", default=0.001, min=0.000001, precision=6)
 	
 	def invoke(self, context, _event):
 		import os
@@ -412,6 +445,9 @@ class MGN_PT_export_option(bpy.types.Panel):
 		sfile = context.space_data
 		operator = sfile.active_operator
 		layout.prop(operator, 'do_tangents')
+		layout.prop(operator, 'sparse_blends')
+		layout.prop(operator, 'blend_threshold')
+		layout.prop(operator, 'normal_tolerance')
 
 class ImportLOD(bpy.types.Operator, ImportHelper):
 	"""Load a SWG LOD File"""
@@ -445,13 +481,18 @@ class ImportLOD(bpy.types.Operator, ImportHelper):
 		keywords = self.as_keywords(ignore=("filter_glob",
 											"files",
 											"filepath"))			  
+		support.begin_import()
+		# Every texture of every file (and the meshes they pull in) converted in one batch
+		support.prepare_textures([os.path.join(os.path.dirname(self.filepath), f.name) for f in self.files], context.preferences.addons[__package__].preferences.swg_root)
 		for f in self.files:   
 			dirname = os.path.dirname(self.filepath)
 			filepath = os.path.join(dirname, f.name) 
 			result = import_lod.load_new(context, filepath, parent = None, **keywords)
 			if 'ERROR' in result:
 				self.report({'ERROR'}, 'Something went wrong importing LOD')
+				support.end_import()
 				return {'CANCELLED'}		
+		support.end_import()
 		return {'FINISHED'}
 
 	def invoke(self, context, _event):
@@ -647,6 +688,9 @@ class ImportPOB(bpy.types.Operator, ImportHelper):
 											"files",
 											"filepath"))
 			  
+		support.begin_import()
+		# Every texture of every file (and the meshes they pull in) converted in one batch
+		support.prepare_textures([os.path.join(os.path.dirname(self.filepath), f.name) for f in self.files], context.preferences.addons[__package__].preferences.swg_root)
 		for f in self.files:   
 			dirname = os.path.dirname(self.filepath)
 			filepath = os.path.join(dirname, f.name) 
@@ -655,8 +699,10 @@ class ImportPOB(bpy.types.Operator, ImportHelper):
 			result = import_pob.load_new(context, filepath, **keywords)
 			if 'ERROR' in result:
 				self.report({'ERROR'}, 'Something went wrong importing LOD')
+				support.end_import()
 				return {'CANCELLED'}
 		
+		support.end_import()
 		return {'FINISHED'}
 
 	def draw(self, context):
@@ -966,6 +1012,8 @@ NOTE: If this option is disabled, you need to set the "SWG Client Extract Dir" p
 		swg_root = context.preferences.addons[__package__].preferences.swg_root
 		tex_to_png = context.preferences.addons[__package__].preferences.convert_tex_to_png
 		print(f"invoke with: {context.active_object.name}")	 
+		support.begin_import()
+		shaders = {}
 		for slot in context.active_object.material_slots:
 			mat = slot.material	
 			print(f"Looking for material: {mat.name}")
@@ -973,11 +1021,16 @@ NOTE: If this option is disabled, you need to set the "SWG Client Extract Dir" p
 			real_shader_path = support.find_file(path, swg_root)
 			if real_shader_path:
 				print(f'..found it...')
-				shader = swg_types.SWGShader(real_shader_path, swg_root)
-				support.configure_material_from_swg_shader(mat,shader, swg_root, tex_to_png)
+				shaders[mat] = swg_types.SHADER_CACHE.get(real_shader_path, swg_root)
 			else:
 				print(f"WARNING: Couldn't locate real shader path for: {path}")
 
+		if tex_to_png:
+			support.convert_textures(shaders.values(), swg_root)
+		for mat, shader in shaders.items():
+			support.configure_material_from_swg_shader(mat, shader, swg_root, tex_to_png)
+
+		support.end_import()
 		return {'FINISHED'}
 
 class SWG_Add_Material_Operator(bpy.types.Operator):
@@ -997,10 +1050,13 @@ class SWG_Add_Material_Operator(bpy.types.Operator):
 		swg_root = context.preferences.addons[__package__].preferences.swg_root
 		tex_to_png = context.preferences.addons[__package__].preferences.convert_tex_to_png
 		context.active_object.data.materials.append(None)
+		support.begin_import()
 		shader = swg_types.SWGShader(support.clean_path(self.properties.filepath), swg_root)
 		material = bpy.data.materials.new(shader.stripped_shader_name()) 
+		support.get_import_registry().add_material(material)
 		context.active_object.material_slots[len(context.active_object.material_slots)-1].material = material
 		support.configure_material_from_swg_shader(material, shader, swg_root, tex_to_png)
+		support.end_import()
 		return {'FINISHED'}
  
 	def invoke(self, context, event):
@@ -0,0 +1,134 @@
+import struct, zlib
+import numpy
+
+# Decodes the top mip of the DDS flavours the client ships (DXT1/3/5 and
+# uncompressed RGB(A)) with NumPy and writes it out as a PNG, so textures can
+# be converted on worker threads without Blender or Pillow.
+#
+# DDS layout: 'DDS ', 124 byte header (height at 12, width at 16, pixel format
+# flags at 80, fourCC at 84, bit count at 88, R/G/B/A masks at 92..107), data at 128.
+
+DDPF_ALPHAPIXELS = 0x1
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+DDPF_LUMINANCE = 0x20000
+
+class UnsupportedFormat(ValueError):
+	pass
+
+def expand565(colors):
+	r = (colors >> 11) & 0x1f
+	g = (colors >> 5) & 0x3f
+	b = colors & 0x1f
+	return numpy.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2), numpy.full_like(r, 255)], axis=-1)
+
+def decode_color_blocks(blocks, three_color):
+	# blocks: (n, 8) uint8, two 565 endpoints then 16 2-bit indices.
+	# Returns (n, 16, 4) RGBA.
+	endpoints = blocks[:, 0:4].copy().view('<u2').astype(numpy.int32)
+	c0 = endpoints[:, 0]
+	c1 = endpoints[:, 1]
+	p0 = expand565(c0)
+	p1 = expand565(c1)
+	four = (c0 > c1)[:, None] if three_color else numpy.ones((len(blocks), 1), dtype=bool)
+	p2 = numpy.where(four, (2 * p0 + p1) // 3, (p0 + p1) // 2)
+	p3 = numpy.where(four, (p0 + 2 * p1) // 3, 0)
+	palette = numpy.stack([p0, p1, p2, p3], axis=1)
+
+	bits = blocks[:, 4:8].copy().view('<u4')[:, 0]
+	indices = (bits[:, None] >> (numpy.arange(16, dtype=numpy.uint32) * 2)) & 3
+	return palette[numpy.arange(len(blocks))[:, None], indices]
+
+def decode_explicit_alpha(blocks):
+	# DXT3: 16 4-bit alphas
+	bits = blocks[:, 0:8].copy().view('<u8')[:, 0]
+	return ((bits[:, None] >> (numpy.arange(16, dtype=numpy.uint64) * 4)) & 0xf).astype(numpy.int32) * 17
+
+def decode_interpolated_alpha(blocks):
+	# DXT5: two alpha endpoints then 16 3-bit indices
+	a0 = blocks[:, 0].astype(numpy.int32)[:, None]
+	a1 = blocks[:, 1].astype(numpy.int32)[:, None]
+	steps = numpy.arange(1, 7, dtype=numpy.int32)[None, :]
+	eight = ((7 - steps) * a0 + steps * a1) // 7
+	six = ((5 - steps[:, :4]) * a0 + steps[:, :4] * a1) // 5
+	six = numpy.concatenate([six, numpy.zeros_like(a0), numpy.full_like(a0, 255)], axis=1)
+	palette = numpy.concatenate([a0, a1, numpy.where(a0 > a1, eight, six)], axis=1)
+
+	raw = numpy.zeros((len(blocks), 8), dtype=numpy.uint8)
+	raw[:, 0:6] = blocks[:, 2:8]
+	bits = raw.view('<u8')[:, 0]
+	indices = (bits[:, None] >> (numpy.arange(16, dtype=numpy.uint64) * 3)) & 7
+	return palette[numpy.arange(len(blocks))[:, None], indices.astype(numpy.intp)]
+
+def decode_dxt(data, offset, width, height, fourcc):
+	block_size = 8 if fourcc == b'DXT1' else 16
+	bw = max(1, (width + 3) // 4)
+	bh = max(1, (height + 3) // 4)
+	blocks = numpy.frombuffer(data, dtype=numpy.uint8, count=bw * bh * block_size, offset=offset).reshape(-1, block_size)
+	if fourcc == b'DXT1':
+		pixels = decode_color_blocks(blocks, True)
+	else:
+		pixels = decode_color_blocks(blocks[:, 8:16], False)
+		pixels[:, :, 3] = decode_explicit_alpha(blocks) if fourcc in [b'DXT2', b'DXT3'] else decode_interpolated_alpha(blocks)
+	# (block row, block col, y, x, rgba) -> rows of pixels
+	pixels = pixels.reshape(bh, bw, 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(bh * 4, bw * 4, 4)
+	return pixels[:height, :width].astype(numpy.uint8)
+
+def decode_masked(data, offset, width, height, bit_count, masks):
+	size = bit_count // 8
+	raw = numpy.frombuffer(data, dtype=numpy.uint8, count=width * height * size, offset=offset).reshape(-1, size)
+	padded = numpy.zeros((len(raw), 4), dtype=numpy.uint8)
+	padded[:, :size] = raw
+	values = padded.view('<u4')[:, 0]
+	pixels = numpy.full((len(values), 4), 255, dtype=numpy.uint8)
+	for channel, mask in enumerate(masks):
+		if mask == 0:
+			continue
+		shift = (mask & -mask).bit_length() - 1
+		peak = mask >> shift
+		pixels[:, channel] = ((values & mask) >> shift).astype(numpy.uint64) * 255 // peak
+	return pixels.reshape(height, width, 4)
+
+def decode(data):
+	# Returns the top mip level as a (height, width, 4) uint8 RGBA array.
+	if len(data) < 128 or data[0:4] != b'DDS ':
+		raise UnsupportedFormat("not a DDS file")
+	height, width = struct.unpack_from('<2I', data, 12)
+	flags, fourcc, bit_count, r_mask, g_mask, b_mask, a_mask = struct.unpack_from('<I4s5I', data, 80)
+
+	if flags & DDPF_FOURCC:
+		if fourcc not in [b'DXT1', b'DXT2', b'DXT3', b'DXT4', b'DXT5']:
+			raise UnsupportedFormat(f"fourCC {fourcc}")
+		return decode_dxt(data, 128, width, height, fourcc)
+	if flags & DDPF_LUMINANCE:
+		# Grey in the red mask, copied to green and blue
+		if bit_count not in [8, 16]:
+			raise UnsupportedFormat(f"{bit_count} bit luminance")
+		pixels = decode_masked(data, 128, width, height, bit_count, [r_mask, 0, 0, a_mask if flags & DDPF_ALPHAPIXELS else 0])
+		pixels[:, :, 1] = pixels[:, :, 0]
+		pixels[:, :, 2] = pixels[:, :, 0]
+		return pixels
+	if flags & DDPF_RGB:
+		if bit_count not in [16, 24, 32]:
+			raise UnsupportedFormat(f"{bit_count} bit RGB")
+		return decode_masked(data, 128, width, height, bit_count, [r_mask, g_mask, b_mask, a_mask if flags & DDPF_ALPHAPIXELS else 0])
+	raise UnsupportedFormat(f"pixel format flags {flags:x}")
+
+def png_chunk(tag, body):
+	return struct.pack('>I', len(body)) + tag + body + struct.pack('>I', zlib.crc32(tag + body))
+
+def write_png(path, pixels, level = 6):
+	height, width = pixels.shape[:2]
+	# Every row starts with filter type 0 (none)
+	rows = numpy.zeros((height, width * 4 + 1), dtype=numpy.uint8)
+	rows[:, 1:] = pixels.reshape(height, width * 4)
+	with open(path, 'wb') as file:
+		file.write(b'\x89PNG\r\n\x1a\n')
+		file.write(png_chunk(b'IHDR', struct.pack('>2I5B', width, height, 8, 6, 0, 0, 0)))
+		file.write(png_chunk(b'IDAT', zlib.compress(rows.tobytes(), level)))
+		file.write(png_chunk(b'IEND', b''))
+
+def convert(dds_path, png_path):
+	with open(dds_path, 'rb') as file:
+		data = file.read()
+	write_png(png_path, decode(data))
@@ -20,6 +20,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import bpy, collections, array, base64, time, datetime, bmesh, os
+import numpy
 from bpy.props import *
 from . import swg_types
 from . import data_types
@@ -27,8 +28,20 @@ from . import data_types
 oznfulllist = ['face','neck','skull','sideburn_l','sideburn_r','chest','torso_f','torso_b','waist_f','waist_b','r_thigh','r_shin','r_foot','l_thigh','l_shin','l_foot','r_arm','r_forearm','r_hand','l_arm','l_forearm','l_hand']
 
 
-def roundedVec3(n):
-    return round(n[0], 3), round(n[1], 3), round(n[2], 3)
+def dedupe_vectors(values, tolerance):
+    # Rows that round to the same multiple of tolerance on every axis share one
+    # entry. Returns the table (the first row seen in each group, unchanged, in
+    # first-seen order) and, for every input row, its index in the table. Rows
+    # either side of a rounding boundary stay separate however close they are.
+    values = numpy.asarray(values, dtype=numpy.float64)
+    quantized = numpy.round(values / tolerance).astype(numpy.int64)
+    if len(quantized) == 0:
+        return numpy.zeros((0, quantized.shape[1])), numpy.zeros(0, dtype=numpy.int64)
+    unique, first, inverse = numpy.unique(quantized, axis=0, return_index=True, return_inverse=True)
+    order = numpy.argsort(first)
+    remap = numpy.empty(len(order), dtype=numpy.int64)
+    remap[order] = numpy.arange(len(order))
+    return values[first[order]], remap[inverse.ravel()]
         
 def mesh_triangulate(me):
     bm = bmesh.new()
@@ -37,7 +50,7 @@ def mesh_triangulate(me):
     bm.to_mesh(me)
     bm.free()
 
-def save(context, filepath, *, do_tangents = True):
+def save(context, filepath, *, do_tangents = True, sparse_blends = True, blend_threshold = 0.0001, normal_tolerance = 0.001):
     objects = context.selected_objects
 
     if len(objects) == 0:
@@ -55,12 +68,12 @@ def save(context, filepath, *, do_tangents = True):
             dirname = os.path.dirname(filepath)
             fullpath = os.path.join(dirname, obj.name + ".msh")
             extract_dir=context.preferences.addons[__package__].preferences.swg_root
-            result = export_mgn(fullpath, extract_dir, obj, do_tangents)
+            result = export_mgn(fullpath, extract_dir, obj, do_tangents, sparse_blends, blend_threshold, normal_tolerance)
             if not 'FINISHED' in result:
                 return {'CANCELLED'}
     return {'FINISHED'}
 
-def export_mgn(filepath, extract_dir, obj, do_tangents = True):    
+def export_mgn(filepath, extract_dir, obj, do_tangents = True, sparse_blends = True, blend_threshold = 0.0001, normal_tolerance = 0.001):    
     starttime = time.time()
 
     mb = obj.matrix_basis
@@ -75,7 +88,9 @@ def export_mgn(filepath, extract_dir, obj, do_tangents = True):
 
     t_ln = array.array(data_types.ARRAY_FLOAT64, (0.0,)) * len(bm.loops) * 3
     bm.loops.foreach_get("normal", t_ln)
-    normals = list(map(list, zip(*[iter(t_ln)]*3)))    
+    loop_normals = numpy.array(t_ln).reshape(-1, 3)
+    loop_verts = numpy.empty(len(bm.loops), dtype=numpy.int32)
+    bm.loops.foreach_get("vertex_index", loop_verts)
     
     if do_tangents:
         t_ln = array.array(data_types.ARRAY_FLOAT64, [0.0,]) * len(bm.loops) * 3
@@ -110,21 +125,14 @@ def export_mgn(filepath, extract_dir, obj, do_tangents = True):
     if len(mgn.skeletons) == 0:
         mgn.skeletons.append("appearance/skeleton/all_b.skt")
 
-    for vert in bm.vertices:
-        mgn.positions.append([-vert.co[0],vert.co[2],-vert.co[1]])
+    # Blender to SWG axes: (x, y, z) -> (-x, z, -y)
+    co = numpy.empty(len(bm.vertices) * 3, dtype=numpy.float32)
+    bm.vertices.foreach_get("co", co)
+    mgn.positions = co.reshape(-1, 3)[:, [0, 2, 1]] * numpy.float32([-1, 1, -1])
 
-    reverse_normal_lookup={}
-    normal_index=0
-    all_normals=[]
-    for normal in normals:
-        converted_normal=roundedVec3([-normal[0], normal[2], -normal[1]])
-        if not converted_normal in reverse_normal_lookup.keys():
-            reverse_normal_lookup[converted_normal] = normal_index
-            #print(f"{converted_normal} : {normal_index}")
-            normal_index += 1
-            mgn.normals.append(converted_normal)
-            #mgn.normals.append([-normal[0], normal[2], -normal[1]])
-        all_normals.append(normal)
+    # NORM table and the NORM index of every loop. Normals that round to the same
+    # multiple of normal_tolerance share the first one's entry, so NORM stays unit length.
+    mgn.normals, loop_nidx = dedupe_vectors(loop_normals[:, [0, 2, 1]] * [-1, 1, -1], normal_tolerance)
 
     if do_tangents:
         mgn.dot3=[]
@@ -134,20 +142,25 @@ def export_mgn(filepath, extract_dir, obj, do_tangents = True):
 
     for keys in bpy.data.shape_keys:
         if keys == bm.shape_keys:
+            basis = keys.key_blocks[0].data
+            basis_co = numpy.empty(len(basis) * 3, dtype=numpy.float32)
+            basis.foreach_get("co", basis_co)
+            co = numpy.empty_like(basis_co)
             for key in keys.key_blocks[1:]:
 
                 blt = swg_types.SWGBLendShape()
                 blt.name = key.name
-                blt.dot3 = []
-                basis = keys.key_blocks[0].data
-                for j, kv in enumerate(key.data):
-                    delta = kv.co - basis[j].co
-                    #if delta[0] != 0 and delta[1] != 0 and delta[2] != 0:
-                    blt.positions.append([j, [-delta[0], delta[2], -delta[1]]])
-                    if do_tangents:
-                        blt.dot3.append([j, [0,0,0]])
-                for n, norm in enumerate(reverse_normal_lookup):                    
-                    blt.normals.append([n, [0,0,0]])
+                key.data.foreach_get("co", co)
+                deltas = (co - basis_co).reshape(-1, 3)[:, [0, 2, 1]] * numpy.float32([-1, 1, -1])
+                if sparse_blends:
+                    # Only vertices the key moves. Normal and DOT3 deltas are always zero, so none are written.
+                    blt.positions = swg_types.SWGBLendShape.sparse_deltas(deltas, blend_threshold)
+                    blt.normals = swg_types.SWGBLendShape.make_deltas([], [])
+                    blt.dot3 = None
+                else:
+                    blt.positions = swg_types.SWGBLendShape.make_deltas(numpy.arange(len(deltas)), deltas)
+                    blt.normals = swg_types.SWGBLendShape.make_deltas(numpy.arange(len(mgn.normals)), numpy.zeros((len(mgn.normals), 3)))
+                    blt.dot3 = swg_types.SWGBLendShape.make_deltas(numpy.arange(len(deltas)), numpy.zeros((len(deltas), 3))) if do_tangents else []
                 mgn.blends.append(blt)
             
     face_index_pairs = [(face, index) for index, face in enumerate(bm.polygons)]
@@ -158,7 +171,9 @@ def export_mgn(filepath, extract_dir, obj, do_tangents = True):
             faces_by_material[f.material_index] = []   
         faces_by_material[f.material_index].append((f,f.index))
 
-    uv_layer = bm.uv_layers.active.data[:]
+    uv_layer = numpy.empty(len(bm.loops) * 2, dtype=numpy.float32)
+    bm.uv_layers.active.data.foreach_get("uv", uv_layer)
+    uv_layer = uv_layer.reshape(-1, 2)
     global_tri_index=0
     for material_index in faces_by_material:
         last_tri_index = None
@@ -168,11 +183,8 @@ def export_mgn(filepath, extract_dir, obj, do_tangents = True):
         psdt.name = obj.material_slots[material_index].material.name
         mgn.psdts.append(psdt)
 
-        reverse_position_lookup={}
-        pidx_id = 0
         psdt.prims.append([])
-        psdt.uvs.append([])
-        psdt.dot3 = []
+        loops = []
         
         for f in faces:
             face = f[0]
@@ -181,21 +193,7 @@ def export_mgn(filepath, extract_dir, obj, do_tangents = True):
             t2=None
             t3=None
             for uv_index, l_index in enumerate(face.loop_indices):
-                master_vert_id = face.vertices[uv_index]
-
-                if not master_vert_id in reverse_position_lookup:
-                    reverse_position_lookup[master_vert_id] =  pidx_id                    
-                    pidx_id += 1
-
-                psdt.pidx.append(master_vert_id)
-                #psdt.nidx.append(l_index)
-                normal = all_normals[l_index]
-                converted_normal=roundedVec3([-normal[0], normal[2], -normal[1]])
-                psdt.nidx.append(reverse_normal_lookup[converted_normal])
-                psdt.uvs[0].append(uv_layer[l_index].uv)
-
-                if do_tangents:
-                    psdt.dot3.append(l_index)
+                loops.append(l_index)
                 
                 if last_tri_index == None:
                     last_tri_index = l_index
@@ -215,6 +213,13 @@ def export_mgn(filepath, extract_dir, obj, do_tangents = True):
 
                 running_tri_index += 1
 
+        # Everything per loop comes straight out of the whole-mesh loop arrays
+        loops = numpy.array(loops, dtype=numpy.int64)
+        psdt.pidx = loop_verts[loops]
+        psdt.nidx = loop_nidx[loops]
+        psdt.uvs.append(uv_layer[loops])
+        psdt.dot3 = loops if do_tangents else []
+
     vertex_groups = obj.vertex_groups
     joint_names = vertex_groups.keys()
     twdtdata = {}
@@ -25,6 +25,7 @@ import bpy
 import base64
 import bmesh
 import time, datetime, array, functools, math
+import numpy
 from . import vector3D
 from . import swg_types
 from . import vertex_buffer_format
@@ -122,7 +123,7 @@ def export_one(fullpath, extract_dir, obj, flip_uv_vertical):
 			print(f"Asked for material index: {mat_index} but we only have {len(obj.material_slots)}. Won't do anything with {len(faces_by_material[mat_index])} triangles I guess")
 			continue
 
-		thisSPS = swg_types.SPS(this_mat_index, f'shader/{material.name}.sht', 0, [], [])
+		thisSPS = swg_types.SPS(this_mat_index, f'shader/{material.name}.sht', 0)
 		this_mat_index += 1
 
 		uvSets = 1
@@ -151,6 +152,15 @@ def export_one(fullpath, extract_dir, obj, flip_uv_vertical):
 
 		unique_verts = {}
 		last_unique_vert_index = 0
+		positions = []
+		vert_normals = []
+		colors0 = []
+		colors1 = []
+		# UV sets the material declares beyond the mesh's UV layers get no column
+		# here; SPS.vertex_array writes them as zeros.
+		uvs = [[] for i in range(0, min(uvSets, len(me.uv_layers)))]
+		dot3 = []
+		tris = []
 		for face_index, face in enumerate(face_list):
 			p1 = p2 = p3 = None
 			for uv_index, l_index in enumerate(face.loop_indices):
@@ -163,35 +173,30 @@ def export_one(fullpath, extract_dir, obj, flip_uv_vertical):
 					unique_verts[rounded] = last_unique_vert_index
 					last_unique_vert_index += 1
 
-					swg_v = swg_types.SWGVertex()
-					swg_v.pos = Vector(support.convert_vector3(v.co))
-					swg_v.normal = Vector(support.convert_vector3(normal))
+					positions.append(support.convert_vector3(v.co)[:])
+					vert_normals.append(support.convert_vector3(normal)[:])
 					
 					if doColor0:
-						swg_v.color0 = me.vertex_colors["color0"].data[l_index].color
+						colors0.append(me.vertex_colors["color0"].data[l_index].color[:])
 
 					if doColor1:
-						swg_v.color1 = me.vertex_colors["color1"].data[l_index].color
-
-					for i in range(0, uvSets):
-						if i >= len(me.uv_layers):
-							break
+						colors1.append(me.vertex_colors["color1"].data[l_index].color[:])
 
+					for i in range(0, len(uvs)):
 						uv = me.uv_layers[i].data[l_index].uv.copy()
 
 						if flip_uv_vertical:
 							uv[1] = (1.0 - uv[1])
 
-						swg_v.texs.append(uv)
+						uvs[i].append(uv[:])
 						#if abs(uv[0]) > 10 or abs(uv[1]) > 10:
 						#print(f"SPS {this_mat_index-1} Vert {v.index} UV: {i} = {uv}")
 
 					if doDOT3:
 						loop = me.loops[l_index]						
 						tang = support.convert_vector3(loop.tangent)
-						swg_v.texs.append([ *tang, loop.bitangent_sign])
+						dot3.append([ *tang, loop.bitangent_sign])
 
-					thisSPS.verts.append(swg_v)
 					total_verts += 1
 
 				if p1 == None:
@@ -200,9 +205,17 @@ def export_one(fullpath, extract_dir, obj, flip_uv_vertical):
 					p2 = unique_verts[rounded]
 				elif p3 == None:
 					p3 = unique_verts[rounded]
-					thisSPS.tris.append(swg_types.Triangle(p3, p2, p1))
+					tris.append((p3, p2, p1))
 					total_tris += 1
 					p1 = p2 = p3 = None	
+
+		thisSPS.positions = numpy.array(positions, dtype=numpy.float32).reshape(-1, 3)
+		thisSPS.normals = numpy.array(vert_normals, dtype=numpy.float32).reshape(-1, 3)
+		thisSPS.colors0 = numpy.array(colors0, dtype=numpy.float32).reshape(-1, 4) if doColor0 else None
+		thisSPS.colors1 = numpy.array(colors1, dtype=numpy.float32).reshape(-1, 4) if doColor1 else None
+		thisSPS.uvs = [numpy.array(uv, dtype=numpy.float32).reshape(-1, 2) for uv in uvs]
+		thisSPS.dot3 = numpy.array(dot3, dtype=numpy.float32).reshape(-1, 4) if doDOT3 else None
+		thisSPS.indices = numpy.array(tris, dtype=numpy.uint32).reshape(-1, 3)
 			
 		print(f"SPS {str(thisSPS.no)}: Unique Verts: {str(len(unique_verts))} UV Channels: {str(vertex_buffer_format.getNumberOfTextureCoordinateSets(thisSPS.flags))} Has flags {str(thisSPS.flags)}") 
 		newMsh.spss.append(thisSPS)	 
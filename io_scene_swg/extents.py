@@ -1,3 +1,4 @@
+import numpy
 from . import nsg_iff
 from . import vector3D
 from . import swg_types
@@ -310,3 +311,72 @@ class MeshExtent(object):
         iff.exitForm("0000")
         iff.exitForm("CMSH")
 
+
+# In-place edits of extent blocks in an indexed IFF (see IFF.build_index), for
+# callers that rewrite a file without parsing it into Extents objects.
+
+def chunk_nodes(node):
+    for child in node.children:
+        if child.is_form:
+            yield from chunk_nodes(child)
+        else:
+            yield child
+
+def transform_points(points, matrix):
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+def transform_in_place(iff, node, matrix):
+    # Moves every sphere, box, cylinder and collision mesh under node by the 4x4
+    # matrix. Boxes become the axis aligned box around their moved corners,
+    # radii and heights scale by the largest scale of the matrix.
+    scale = numpy.linalg.norm(matrix[:3, :3], axis=0)
+    for chunk in chunk_nodes(node):
+        if chunk.tag == "SPHR":
+            # center, radius
+            iff.enterNode(chunk)
+            values = iff.read_float_array(4)
+            values[:3] = transform_points(values[:3], matrix)
+            values[3] *= scale.max()
+        elif chunk.tag == "BOX ":
+            # two corners, kept in the order the file has them
+            iff.enterNode(chunk)
+            box = iff.read_float_array(6).reshape(2, 3)
+            corners = numpy.array([[box[i][0], box[j][1], box[k][2]] for i in range(2) for j in range(2) for k in range(2)])
+            corners = transform_points(corners, matrix)
+            if numpy.all(box[0] >= box[1]):
+                values = numpy.concatenate([corners.max(axis=0), corners.min(axis=0)])
+            else:
+                values = numpy.concatenate([corners.min(axis=0), corners.max(axis=0)])
+        elif chunk.tag == "CYLN":
+            # base, radius, height; the axis stays along y
+            iff.enterNode(chunk)
+            values = iff.read_float_array(5)
+            values[:3] = transform_points(values[:3], matrix)
+            values[3] *= max(scale[0], scale[2])
+            values[4] *= scale[1]
+        elif chunk.tag == "VERT" and chunk.parent.parent != None and chunk.parent.parent.tag == "IDTL":
+            iff.enterNode(chunk)
+            values = transform_points(iff.read_float_array().reshape(-1, 3), matrix)
+        else:
+            continue
+        iff.enterNode(chunk)
+        iff.overwriteNumpy(values, '<f4')
+
+def fit_in_place(iff, node, points):
+    # Rewrites the EXBX or EXSP at node to enclose points, the same way
+    # BoxExtents.write derives its sphere from the box.
+    if len(points) == 0 or node.tag not in ["EXBX", "EXSP"]:
+        return
+    low = points.min(axis=0)
+    high = points.max(axis=0)
+    center = (low + high) / 2.0
+    if node.tag == "EXBX":
+        radius = numpy.linalg.norm(high - low) / 2.0
+    else:
+        radius = numpy.linalg.norm(points - center, axis=1).max()
+    for chunk in chunk_nodes(node):
+        iff.enterNode(chunk)
+        if chunk.tag == "SPHR":
+            iff.overwriteNumpy([*center, radius], '<f4')
+        elif chunk.tag == "BOX ":
+            iff.overwriteNumpy([*high, *low], '<f4')
@@ -0,0 +1,188 @@
+import os, json, zlib, tempfile
+from . import tre_archive
+
+INDEX_VERSION = 1
+
+def normalize(relative_path):
+	return relative_path.replace('\\', '/').strip('/').lower()
+
+class RootIndex():
+	# Every file under one root, keyed by case-normalized relative path. dirs
+	# remembers each directory's mtime so refresh() only relists directories
+	# that changed since the index was built.
+	def __init__(self, root):
+		self.root = os.path.abspath(root)
+		self.files = {}
+		self.dirs = {}
+		self.changed = False
+
+	def cache_path(self):
+		name = f"swg_file_index_{zlib.crc32(self.root.encode('utf-8')):08x}.json"
+		return os.path.join(tempfile.gettempdir(), name)
+
+	def load(self):
+		try:
+			with open(self.cache_path(), 'r', encoding='utf-8') as file:
+				data = json.load(file)
+		except (OSError, ValueError):
+			return False
+		if data.get('version') != INDEX_VERSION or data.get('root') != self.root:
+			return False
+		self.files = data['files']
+		self.dirs = data['dirs']
+		return True
+
+	def save(self):
+		if not self.changed:
+			return
+		try:
+			with open(self.cache_path(), 'w', encoding='utf-8') as file:
+				json.dump({'version': INDEX_VERSION, 'root': self.root, 'files': self.files, 'dirs': self.dirs}, file)
+			self.changed = False
+		except OSError as e:
+			print(f"Couldn't save file index for {self.root}: {e}")
+
+	def scan_dir(self, rel):
+		# Relists one directory, returns the subdirectories it contains now.
+		path = os.path.join(self.root, rel) if rel != "" else self.root
+		prefix = (rel + '/') if rel != "" else ""
+		subdirs = []
+		try:
+			self.dirs[rel] = os.stat(path).st_mtime
+			with os.scandir(path) as entries:
+				for entry in entries:
+					if entry.is_dir():
+						subdirs.append(prefix + entry.name)
+					else:
+						self.files[normalize(prefix + entry.name)] = prefix + entry.name
+		except OSError:
+			self.dirs.pop(rel, None)
+		self.changed = True
+		return subdirs
+
+	def forget_dir(self, rel):
+		prefix = normalize(rel) + '/'
+		for key in [k for k in self.files if k.startswith(prefix) and k.find('/', len(prefix)) == -1]:
+			del self.files[key]
+		self.dirs.pop(rel, None)
+
+	def build(self):
+		self.files = {}
+		self.dirs = {}
+		pending = [""]
+		while len(pending) > 0:
+			pending.extend(self.scan_dir(pending.pop()))
+
+	def refresh(self):
+		# A directory's mtime changes when entries are added, removed or renamed
+		# in it (not below it), so only those directories get relisted.
+		pending = []
+		for rel, mtime in list(self.dirs.items()):
+			try:
+				if os.stat(os.path.join(self.root, rel) if rel != "" else self.root).st_mtime == mtime:
+					continue
+			except OSError:
+				pass
+			pending.append(rel)
+
+		while len(pending) > 0:
+			rel = pending.pop()
+			if rel != "":
+				self.forget_dir(rel)
+			else:
+				for key in [k for k in self.files if k.find('/') == -1]:
+					del self.files[key]
+			old = set(d for d in self.dirs if os.path.dirname(d) == rel and d != rel)
+			subdirs = self.scan_dir(rel)
+			for d in old.difference(subdirs):
+				for sub in [s for s in self.dirs if s == d or s.startswith(d + '/')]:
+					self.forget_dir(sub)
+			for d in subdirs:
+				if d not in self.dirs:
+					pending.append(d)
+
+	def find(self, relative_path):
+		rel = self.files.get(normalize(relative_path))
+		if rel == None:
+			return None
+		return os.path.join(self.root, *rel.split('/'))
+
+	def add(self, relative_path):
+		rel = relative_path.replace('\\', '/').strip('/')
+		self.files[normalize(rel)] = rel
+		self.changed = True
+
+class FileIndex():
+	# Lookup over several roots; earlier roots win when a file exists in more than one.
+	# A root can also be a .tre archive, which is searched through its own TOC.
+	def __init__(self, roots):
+		self.roots = []
+		# Normalized paths no root has, remembered until the next import starts
+		self.missing = set()
+		for root in roots:
+			if tre_archive.is_archive(root):
+				self.roots.append(tre_archive.get_archive(root))
+				continue
+			index = RootIndex(root)
+			if index.load():
+				index.refresh()
+			else:
+				print(f"Indexing SWG root: {index.root}")
+				index.build()
+			index.save()
+			self.roots.append(index)
+
+	def find(self, relative_path):
+		key = normalize(relative_path)
+		if key in self.missing:
+			return None
+
+		for index in self.roots:
+			path = index.find(relative_path)
+			if path != None:
+				return path
+
+		# Not indexed: could have been added after the index was refreshed.
+		# Added to the index now, written out by save().
+		for index in self.roots:
+			if not isinstance(index, RootIndex):
+				continue
+			path = os.path.join(index.root, relative_path)
+			if os.path.exists(path):
+				index.add(relative_path)
+				return path
+		self.missing.add(key)
+		return None
+
+	def save(self):
+		for index in self.roots:
+			if isinstance(index, RootIndex):
+				index.save()
+
+indexes = {}
+
+def split_roots(root):
+	if isinstance(root, (list, tuple)):
+		return tuple(r for r in root if r != "")
+	return tuple(r for r in root.split(os.pathsep) if r != "")
+
+def get_index(root):
+	roots = split_roots(root)
+	index = indexes.get(roots)
+	if index == None:
+		index = FileIndex(roots)
+		indexes[roots] = index
+	return index
+
+def begin_session():
+	# Lets files that were missing before be found again
+	for index in indexes.values():
+		index.missing.clear()
+
+def save_all():
+	for index in indexes.values():
+		index.save()
+
+def clear():
+	save_all()
+	indexes.clear()
@@ -26,11 +26,13 @@ from bpy.props import *
 from bpy_extras.io_utils import unpack_list, unpack_face_list
 from mathutils import Vector, Quaternion, Matrix, Euler
 import math
+import numpy
 
 def import_mgn( context, 
                 filepath, 
                 *,      
-                global_matrix=None):
+                global_matrix=None,
+                weight_step=0.0):
 
     swg_root = context.preferences.addons[__package__].preferences.swg_root
 
@@ -41,40 +43,26 @@ def import_mgn( context,
     mesh = bpy.data.meshes.new(mesh_name)
         
     edges=[]
-    blender_verts = []
-    blender_norms = []
-    for v in mgn.positions:
-        blender_verts.append([v[0],v[1],v[2]])
-
-    for n in mgn.normals:
-        blender_norms.append([n[0],n[1],-n[2]])
+    blender_verts = mgn.positions.tolist()
+    blender_norms = (mgn.normals * [1, 1, -1]).tolist()
     
     scene_object = bpy.data.objects.new(mesh_name, mesh)
     context.collection.objects.link(scene_object)
 
-    faces_by_material=[]
+    face_materials=[]
     normals=[]
     tris = []
     tris_flat = []
     uvs_flat = []
-    for pid, psdt in enumerate(mgn.psdts):
-        mat_name = psdt.stripped_shader_name()
-        material = None
-        
-        for mat in bpy.data.materials:
-            if mat.name == mat_name:
-                material = mat
+    tex_to_png = context.preferences.addons[__package__].preferences.convert_tex_to_png
 
-        if material == None:
-            material = bpy.data.materials.new(psdt.stripped_shader_name()) 
+    for pid, psdt in enumerate(mgn.psdts):
+        material = support.find_or_create_material(psdt.stripped_shader_name())
         if psdt.real_shader: 
-           tex_to_png = context.preferences.addons[__package__].preferences.convert_tex_to_png
            support.configure_material_from_swg_shader(material, psdt.real_shader, swg_root, tex_to_png) 
 
         mesh.materials.append(material)
 
-        faces_by_material.append([])
-
         for prim in psdt.prims:
             for tri in prim:
                 p1 = psdt.pidx[tri.p3]
@@ -89,7 +77,7 @@ def import_mgn( context,
                 tris_flat.append(p2)
                 tris_flat.append(p3)
                 tris.append([p1, p2, p3])
-                faces_by_material[pid].append((p1, p2, p3))
+                face_materials.append(pid)
 
 
                 for uv_layer_num in range(0, psdt.num_uvs):                    
@@ -113,10 +101,7 @@ def import_mgn( context,
             face_map = scene_object.face_maps.new(name=ozc[0])
             face_map.add(ozc[1])   
 
-    for flist in mesh.polygons: 
-        for id, face_list in enumerate(faces_by_material):
-            if flist.vertices[:] in face_list:
-                flist.material_index = id
+    mesh.polygons.foreach_set("material_index", numpy.array(face_materials, dtype=numpy.int32))
 
     for i, uvs in enumerate(uvs_flat):
         print(f'UV Layer: {i} -- lengths of UVs ({len(uvs)}) and Tri indecies ({len(tris_flat)})')
@@ -139,22 +124,24 @@ def import_mgn( context,
         vg = scene_object.vertex_groups.new(name=bone)
         vgs[i] = vg
 
-    for i, vertex_weights in enumerate(mgn.vertex_weights):
-        sum=0
-        for weight in vertex_weights:
-            #if sum + weight[1] > 1.0:
-            #    weight[1] = (1.0 - sum)
-            #    print(f"Capped bone weight contribution of: {i} {weight[0]} to {weight[1]}!")
-            vgs[weight[0]].add([i], weight[1], 'ADD')
+    # One add per bone and weight bucket instead of one per vertex/bone pair
+    for bone, weight, vertices in mgn.skin_weights.weight_groups(weight_step):
+        vgs[bone].add(vertices.tolist(), weight, 'ADD')
     
     scene_object.shape_key_add(name='Basis')
+    basis_co = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get("co", basis_co)
+    basis_co = basis_co.reshape(-1, 3)
+    rotation = numpy.array(global_matrix.to_3x3(), dtype=numpy.float32)
+    translation = numpy.array(global_matrix.translation, dtype=numpy.float32)
     for i, blend in enumerate(mgn.blends):
         sk = scene_object.shape_key_add(name=blend.name)
-        for vert in blend.positions:
-            id = vert[0]
-            delta = [vert[1][0], vert[1][1], -vert[1][2]]
-            delta_v = Vector(delta)
-            sk.data[id].co = scene_object.data.vertices[id].co + (global_matrix @ delta_v)
+        if len(blend.positions) == 0:
+            continue
+        deltas = swg_types.SWGBLendShape.delta_array(blend.positions)
+        co = basis_co.copy()
+        co[deltas['index']] += (deltas['delta'] * numpy.float32([1, 1, -1])) @ rotation.T + translation
+        sk.data.foreach_set("co", co.ravel())
     
     for i, skel in enumerate(mgn.skeletons):
         scene_object[f'SKTM_{i}'] = skel
@@ -21,6 +21,7 @@
 # SOFTWARE.
 
 import base64, os, bpy, time, datetime, math
+import numpy
 import bmesh
 from mathutils import Matrix, Vector, Color, Quaternion, Euler
 
@@ -84,36 +85,28 @@ def import_msh(context,
 	
 	parent.objects.link(obj)
 
-	faces_by_material = {}
-	materials_by_face_index = []
-	normals=[]
-	verts = []   
-	color0 = []
-	color1 = []
+	# Everything is gathered per SPS into flat arrays (one row per vertex,
+	# loop or face across the whole mesh) and pushed with foreach_set.
+	positions = []
+	loop_verts = []
+	loop_normals = []
+	loop_colors0 = []
+	loop_colors1 = []
+	face_materials = []
 	uvs_by_depth = {}
 
 	highest_vert_ind=0
-	global_loop_index=0
+	loop_count=0
 	
 	any_sps_has_color0 = False
 	any_sps_has_color1 = False
+	tex_to_png = context.preferences.addons[__package__].preferences.convert_tex_to_png
+
 	for index, sps in enumerate(msh.spss):
 		
 		num_uv_sets = sps.getNumUVSets()
-		for i in range(0, num_uv_sets):
-			if i not in uvs_by_depth.keys():
-				uvs_by_depth[i] = {}
-
-		faces_by_material[index] = []
-		mat_name = sps.stripped_shader_name()
-		material = None
-		
-		for mat in bpy.data.materials:
-			if mat.name == mat_name:
-				material = mat
 
-		if material == None:
-			material = bpy.data.materials.new(sps.stripped_shader_name()) 
+		material = support.find_or_create_material(sps.stripped_shader_name())
 
 		material["DOT3"] = sps.hasDOT3()
 		material["UVSets"] = num_uv_sets
@@ -121,88 +114,81 @@ def import_msh(context,
 		material["Color1"] = sps.hasColor1()
 
 		if sps.real_shader:
-			tex_to_png = context.preferences.addons[__package__].preferences.convert_tex_to_png
 			support.configure_material_from_swg_shader(material, sps.real_shader, swg_root, tex_to_png) 
 
 		mesh.materials.append(material)
 
-		uvs = []
-		for ind, vert in enumerate(sps.verts):
-			verts.append(support.convert_vector3(vert.pos))
-
-		for tri in sps.tris:
-			p3 = tri.p3 + highest_vert_ind
-			p2 = tri.p2 + highest_vert_ind
-			p1 = tri.p1 + highest_vert_ind
-			faces_by_material[index].append((p3, p2, p1))
-			p3n = sps.verts[tri.p3].normal
-			p2n = sps.verts[tri.p2].normal
-			p1n = sps.verts[tri.p1].normal		   
-			normals.append(support.convert_vector3([p3n.x, p3n.y, p3n.z]))
-			normals.append(support.convert_vector3([p2n.x, p2n.y, p2n.z]))
-			normals.append(support.convert_vector3([p1n.x, p1n.y, p1n.z]))
-
-			for loop_index, vert_index in enumerate([tri.p3, tri.p2, tri.p1]):
-				vert = sps.verts[vert_index]
-
-				if sps.hasColor0():
-					any_sps_has_color0 = True
-					color0.append(vert.color0)
-				else:
-					color0.append([1,1,1,1])
-					
-				if sps.hasColor1():
-					any_sps_has_color1 = True
-					color1.append(vert.color1)
-				else:
-					color1.append([1,1,1,1])
-
-				for uvi in range(0, num_uv_sets):
-					uv = vert.texs[uvi] 
-					uvs_by_depth[uvi][global_loop_index] = uv
-					#print(f"SPS {index}, Vert {global_loop_index} UV: {uvi} = {Vector(uv)}")
-
-				global_loop_index += 1
-
-			materials_by_face_index.append(index)
-		highest_vert_ind += len(sps.verts)
-	mesh.from_pydata(verts, [], sum(faces_by_material.values(), []))
-
-	for flist in mesh.polygons:
-		flist.material_index = materials_by_face_index[flist.index]
+		num_verts = sps.vertex_count()
+		# SWG winds the other way: each triangle's loops are t3, t2, t1
+		tris = sps.indices.astype(numpy.int64)[:, ::-1].ravel()
+		num_loops = len(tris)
+
+		if sps.positions is not None:
+			positions.append(sps.positions[:, [0, 2, 1]])
+		else:
+			positions.append(numpy.zeros((num_verts, 3), dtype=numpy.float32))
+		loop_verts.append(tris + highest_vert_ind)
+		if sps.normals is not None:
+			loop_normals.append(sps.normals[tris][:, [0, 2, 1]])
+		else:
+			loop_normals.append(numpy.zeros((num_loops, 3), dtype=numpy.float32))
+
+		if sps.hasColor0() and num_loops > 0:
+			any_sps_has_color0 = True
+			loop_colors0.append(sps.colors0[tris])
+		else:
+			loop_colors0.append(numpy.ones((num_loops, 4), dtype=numpy.float32))
+		if sps.hasColor1() and num_loops > 0:
+			any_sps_has_color1 = True
+			loop_colors1.append(sps.colors1[tris])
+		else:
+			loop_colors1.append(numpy.ones((num_loops, 4), dtype=numpy.float32))
+
+		for uvi in range(0, num_uv_sets):
+			uv = numpy.zeros((num_loops, 2), dtype=numpy.float32)
+			dim = min(2, sps.uvs[uvi].shape[1])
+			uv[:, :dim] = sps.uvs[uvi][tris][:, :dim]
+			if flip_uv_vertical:
+				uv[:, 1] = 1.0 - uv[:, 1]
+			uvs_by_depth.setdefault(uvi, []).append((loop_count, uv))
+
+		face_materials.append(numpy.full(num_loops // 3, index, dtype=numpy.int32))
+		highest_vert_ind += num_verts
+		loop_count += num_loops
+
+	positions = numpy.concatenate(positions).astype(numpy.float32) if len(positions) > 0 else numpy.zeros((0, 3), dtype=numpy.float32)
+	loop_verts = numpy.concatenate(loop_verts).astype(numpy.int32) if len(loop_verts) > 0 else numpy.zeros(0, dtype=numpy.int32)
+	face_count = loop_count // 3
+
+	mesh.vertices.add(len(positions))
+	mesh.vertices.foreach_set("co", positions.ravel())
+	mesh.loops.add(loop_count)
+	mesh.loops.foreach_set("vertex_index", loop_verts)
+	mesh.polygons.add(face_count)
+	mesh.polygons.foreach_set("loop_start", numpy.arange(0, loop_count, 3, dtype=numpy.int32))
+	mesh.polygons.foreach_set("loop_total", numpy.full(face_count, 3, dtype=numpy.int32))
+	if face_count > 0:
+		mesh.polygons.foreach_set("material_index", numpy.concatenate(face_materials))
+	mesh.update(calc_edges=True)
 
 	mesh.use_auto_smooth = True
-	mesh.normals_split_custom_set(normals)
+	if loop_count > 0:
+		mesh.normals_split_custom_set(numpy.concatenate(loop_normals).astype(numpy.float32).tolist())
 	
 	for depth, uvs in uvs_by_depth.items():		
 		uv_layer = mesh.uv_layers.new(name=f'uvmap-{depth}')
-		for loop in mesh.loops:
-			try:
-				uv_layer.data[loop.index].uv = [0.0,0.0]
-			except:
-				print(f"*** UVMap: {uv_layer.name} Couldn't default loop: {loop.index}")
-
-		for loop_index, uv in uvs.items():
-			uv_layer.data[loop_index].uv = [uv[0], (uv[1] if not flip_uv_vertical else (1.0 - uv[1]))]
+		data = numpy.zeros((loop_count, 2), dtype=numpy.float32)
+		for start, uv in uvs:
+			data[start:start + len(uv)] = uv
+		uv_layer.data.foreach_set("uv", data.ravel())
 
 	if any_sps_has_color0:
-		mesh.vertex_colors.new(name="color0")
-		color_layer = mesh.vertex_colors["color0"]
-		try:
-			for idx in range(0, len(color0)):
-				color_layer.data[idx].color = color0[idx]
-				c=color_layer.data[idx].color
-		except:
-			print(f"Warning! Color0 only has {len(color0)} but need {len(color_layer.data)}")
+		color_layer = mesh.vertex_colors.new(name="color0")
+		color_layer.data.foreach_set("color", numpy.concatenate(loop_colors0).astype(numpy.float32).ravel())
 
 	if any_sps_has_color1:
-		mesh.vertex_colors.new(name="color1")
-		color_layer = mesh.vertex_colors["color1"]
-		try:
-			for idx in range(0, len(color1)):
-				color_layer.data[idx].color = color1[idx] 
-		except:
-			print(f"Warning! Color1 only has {len(color1)} but need {len(color_layer.data)}")
+		color_layer = mesh.vertex_colors.new(name="color1")
+		color_layer.data.foreach_set("color", numpy.concatenate(loop_colors1).astype(numpy.float32).ravel())
 
 	if remove_duplicate_verts:
 		#print(f"Removing duplicate verts ...")
@@ -1,10 +1,45 @@
-import struct, io, builtins, os, sys
+import struct, io, builtins, os, sys, mmap, zlib
 import time
 import datetime
 import numpy 
+from . import tre_archive
 
 timesExpanded = 0
+
+# Tags are compared as big endian 32 bit ints so navigation never has to slice
+# and decode the header bytes. Names are only decoded when someone asks.
+tag_struct = struct.Struct('>I')
+tag_values = {}
+
+def tag_value(name):
+	value = tag_values.get(name)
+	if value == None:
+		value = int.from_bytes(name.encode('ASCII'), 'big')
+		tag_values[name] = value
+	return value
+
+TAG_FORM = tag_value("FORM")
+
+# The IFF CRC is CRC-32/MPEG-2 (poly 0x04C11DB7, MSB first, no final xor).
+# zlib only does the reflected form of the same polynomial, so feed it every
+# byte bit-reversed and bit-reverse the register at the end.
+crc_reverse_bits = bytes(int(f'{i:08b}'[::-1], 2) for i in range(256))
+CRC_BLOCK_SIZE = 1 << 20
+
+def calculate_crc(data):
+	# data can be any bytes-like object, including a memoryview over part of a
+	# buffer. Only one block at a time is copied for the bit reversal.
+	view = memoryview(data).cast('B')
+	if len(view) == 0:
+		return 0xFFFFFFFF
+	crc = 0
+	for i in range(0, len(view), CRC_BLOCK_SIZE):
+		crc = zlib.crc32(view[i:i + CRC_BLOCK_SIZE].tobytes().translate(crc_reverse_bits), crc)
+	crc ^= 0xFFFFFFFF
+	return int(f'{crc:032b}'[::-1], 2)
+
 class StackFrame():
+	__slots__ = ('start', 'length', 'used')
 	def __init__(self, start, length, used):
 		self.start = start
 		self.length = length
@@ -16,10 +51,46 @@ class StackFrame():
 	def __repr__(self):
 		return self.__str__()
 
+class IffNode():
+	__slots__ = ('tag', 'offset', 'length', 'is_form', 'parent', 'children')
+	# offset is where the block header starts, length is the size stored in the
+	# header (so a form's length includes its 4 byte name).
+	def __init__(self, tag, offset, length, is_form, parent):
+		self.tag = tag
+		self.offset = offset
+		self.length = length
+		self.is_form = is_form
+		self.parent = parent
+		self.children = []
+
+	def __str__(self):
+		return f'{"FORM " if self.is_form else ""}{self.tag} Offset: {self.offset} Length: {self.length}'
+
+	def __repr__(self):
+		return self.__str__()
+
+	def dataOffset(self):
+		return self.offset + (12 if self.is_form else 8)
+
+	def dataLength(self):
+		return self.length - (4 if self.is_form else 0)
+
+	def find(self, path):
+		found = self.find_all(path)
+		return found[0] if len(found) > 0 else None
+
+	def find_all(self, path):
+		# path is a '/' separated list of block names, e.g. "MESH/0005/SPS /0001",
+		# where * matches any name. Every match is returned, in file order.
+		nodes = [self]
+		for name in path.split('/'):
+			nodes = [c for n in nodes for c in n.children if name == '*' or c.tag == name]
+		return nodes
+
 
 class IFF():
 
-	def __init__(self, *, initial_size = 0, filename = ""):
+	def __init__(self, *, initial_size = 0, filename = "", use_mmap = False, append_only = False, data = None):
 		self.inChunk = False
 		self.stack = []
 		self.length = 0
@@ -28,8 +99,18 @@ class IFF():
 		self.in_chunk = False
 		self.timesExpanded = 0
 		self.filename = filename
-		if filename != "":
-			self.open_file(filename)
+		self.mapped = None
+		# In append-only mode every insert goes at the end of the data, so nothing
+		# has to be moved and block lengths are written once, when the block is
+		# exited (or when the file is written/CRC'd with blocks still open).
+		self.append_only = append_only
+		if data != None:
+			# Already in memory, e.g. read out of a TRE archive
+			self.data = data
+			self.length = len(self.data)
+			self.stack.append(StackFrame(0, len(self.data), 0))
+		elif filename != "":
+			self.open_file(filename, use_mmap = use_mmap)
 		else:
 			self.length = initial_size
 			self.data = bytearray(initial_size)
@@ -38,45 +119,25 @@ class IFF():
 			self.stack.append(s)
 
 		self.MAXINT= (2**31 - 1)
-		self.crctable = [
-			0x00000000, 0x04C11DB7, 0x09823B6E, 0x0D4326D9, 0x130476DC, 0x17C56B6B, 0x1A864DB2, 0x1E475005,
-			0x2608EDB8, 0x22C9F00F, 0x2F8AD6D6, 0x2B4BCB61, 0x350C9B64, 0x31CD86D3, 0x3C8EA00A, 0x384FBDBD,
-			0x4C11DB70, 0x48D0C6C7, 0x4593E01E, 0x4152FDA9, 0x5F15ADAC, 0x5BD4B01B, 0x569796C2, 0x52568B75,
-			0x6A1936C8, 0x6ED82B7F, 0x639B0DA6, 0x675A1011, 0x791D4014, 0x7DDC5DA3, 0x709F7B7A, 0x745E66CD,
-			0x9823B6E0, 0x9CE2AB57, 0x91A18D8E, 0x95609039, 0x8B27C03C, 0x8FE6DD8B, 0x82A5FB52, 0x8664E6E5,
-			0xBE2B5B58, 0xBAEA46EF, 0xB7A96036, 0xB3687D81, 0xAD2F2D84, 0xA9EE3033, 0xA4AD16EA, 0xA06C0B5D,
-			0xD4326D90, 0xD0F37027, 0xDDB056FE, 0xD9714B49, 0xC7361B4C, 0xC3F706FB, 0xCEB42022, 0xCA753D95,
-			0xF23A8028, 0xF6FB9D9F, 0xFBB8BB46, 0xFF79A6F1, 0xE13EF6F4, 0xE5FFEB43, 0xE8BCCD9A, 0xEC7DD02D,
-			0x34867077, 0x30476DC0, 0x3D044B19, 0x39C556AE, 0x278206AB, 0x23431B1C, 0x2E003DC5, 0x2AC12072,
-			0x128E9DCF, 0x164F8078, 0x1B0CA6A1, 0x1FCDBB16, 0x018AEB13, 0x054BF6A4, 0x0808D07D, 0x0CC9CDCA,
-			0x7897AB07, 0x7C56B6B0, 0x71159069, 0x75D48DDE, 0x6B93DDDB, 0x6F52C06C, 0x6211E6B5, 0x66D0FB02,
-			0x5E9F46BF, 0x5A5E5B08, 0x571D7DD1, 0x53DC6066, 0x4D9B3063, 0x495A2DD4, 0x44190B0D, 0x40D816BA,
-			0xACA5C697, 0xA864DB20, 0xA527FDF9, 0xA1E6E04E, 0xBFA1B04B, 0xBB60ADFC, 0xB6238B25, 0xB2E29692,
-			0x8AAD2B2F, 0x8E6C3698, 0x832F1041, 0x87EE0DF6, 0x99A95DF3, 0x9D684044, 0x902B669D, 0x94EA7B2A,
-			0xE0B41DE7, 0xE4750050, 0xE9362689, 0xEDF73B3E, 0xF3B06B3B, 0xF771768C, 0xFA325055, 0xFEF34DE2,
-			0xC6BCF05F, 0xC27DEDE8, 0xCF3ECB31, 0xCBFFD686, 0xD5B88683, 0xD1799B34, 0xDC3ABDED, 0xD8FBA05A,
-			0x690CE0EE, 0x6DCDFD59, 0x608EDB80, 0x644FC637, 0x7A089632, 0x7EC98B85, 0x738AAD5C, 0x774BB0EB,
-			0x4F040D56, 0x4BC510E1, 0x46863638, 0x42472B8F, 0x5C007B8A, 0x58C1663D, 0x558240E4, 0x51435D53,
-			0x251D3B9E, 0x21DC2629, 0x2C9F00F0, 0x285E1D47, 0x36194D42, 0x32D850F5, 0x3F9B762C, 0x3B5A6B9B,
-			0x0315D626, 0x07D4CB91, 0x0A97ED48, 0x0E56F0FF, 0x1011A0FA, 0x14D0BD4D, 0x19939B94, 0x1D528623,
-			0xF12F560E, 0xF5EE4BB9, 0xF8AD6D60, 0xFC6C70D7, 0xE22B20D2, 0xE6EA3D65, 0xEBA91BBC, 0xEF68060B,
-			0xD727BBB6, 0xD3E6A601, 0xDEA580D8, 0xDA649D6F, 0xC423CD6A, 0xC0E2D0DD, 0xCDA1F604, 0xC960EBB3,
-			0xBD3E8D7E, 0xB9FF90C9, 0xB4BCB610, 0xB07DABA7, 0xAE3AFBA2, 0xAAFBE615, 0xA7B8C0CC, 0xA379DD7B,
-			0x9B3660C6, 0x9FF77D71, 0x92B45BA8, 0x9675461F, 0x8832161A, 0x8CF30BAD, 0x81B02D74, 0x857130C3,
-			0x5D8A9099, 0x594B8D2E, 0x5408ABF7, 0x50C9B640, 0x4E8EE645, 0x4A4FFBF2, 0x470CDD2B, 0x43CDC09C,
-			0x7B827D21, 0x7F436096, 0x7200464F, 0x76C15BF8, 0x68860BFD, 0x6C47164A, 0x61043093, 0x65C52D24,
-			0x119B4BE9, 0x155A565E, 0x18197087, 0x1CD86D30, 0x029F3D35, 0x065E2082, 0x0B1D065B, 0x0FDC1BEC,
-			0x3793A651, 0x3352BBE6, 0x3E119D3F, 0x3AD08088, 0x2497D08D, 0x2056CD3A, 0x2D15EBE3, 0x29D4F654,
-			0xC5A92679, 0xC1683BCE, 0xCC2B1D17, 0xC8EA00A0, 0xD6AD50A5, 0xD26C4D12, 0xDF2F6BCB, 0xDBEE767C,
-			0xE3A1CBC1, 0xE760D676, 0xEA23F0AF, 0xEEE2ED18, 0xF0A5BD1D, 0xF464A0AA, 0xF9278673, 0xFDE69BC4,
-			0x89B8FD09, 0x8D79E0BE, 0x803AC667, 0x84FBDBD0, 0x9ABC8BD5, 0x9E7D9662, 0x933EB0BB, 0x97FFAD0C,
-			0xAFB010B1, 0xAB710D06, 0xA6322BDF, 0xA2F33668, 0xBCB4666D, 0xB8757BDA, 0xB5365D03, 0xB1F740B4
-		]
-
-
-	def open_file(self, file_path, mode = 'rb'):
+
+
+	def open_file(self, file_path, mode = 'rb', use_mmap = False):
+		archive, name = tre_archive.split_path(file_path)
+		if archive != None:
+			self.data = archive.read(name)
+			self.length = len(self.data)
+			self.stack.append(StackFrame(0, len(self.data), 0))
+			return
+
 		source_stream = builtins.open(file_path, mode)
-		self.data = source_stream.read()
+		if use_mmap and os.fstat(source_stream.fileno()).st_size > 0:
+			# Read-only mapping. The OS pages the file in as it is touched, and
+			# self.data is a memoryview over it so read_misc hands out views
+			# instead of copies. The stack frames are plain offsets either way.
+			self.mapped = mmap.mmap(source_stream.fileno(), 0, access=mmap.ACCESS_READ)
+			self.data = memoryview(self.mapped)
+		else:
+			self.data = source_stream.read()
 		source_stream.close()
 
 		self.length = len(self.data)
@@ -85,11 +146,29 @@ class IFF():
 
 		#print(self.data)
 
+	def close(self):
+		if self.mapped == None:
+			return
+		try:
+			self.data.release()
+			self.mapped.close()
+		except BufferError:
+			# Someone still holds a view from read_misc; the map is freed with it.
+			pass
+		self.data = None
+		self.mapped = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
 	def getCurrentName(self):
 		return self.getBlockName(self.stack_depth)
 
 	def getBlockName(self, depth):
-		if self.getFirstTag(depth) == "FORM":
+		if self.getFirstTagValue(depth) == TAG_FORM:
 			return self.getSecondTag(depth)
 		else:
 			return self.getFirstTag(depth)
@@ -98,10 +177,10 @@ class IFF():
 		return self.getLength(self.stack_depth)
 
 	def isCurrentChunk(self):
-		return (self.getFirstTag(self.stack_depth) != "FORM")
+		return (self.getFirstTagValue(self.stack_depth) != TAG_FORM)
 
 	def isCurrentForm(self):
-		return (self.getFirstTag(self.stack_depth) == "FORM")
+		return (self.getFirstTagValue(self.stack_depth) == TAG_FORM)
 
 	def atEndOfForm(self):
 		return self.stack[self.stack_depth].used == self.stack[self.stack_depth].length
@@ -111,18 +190,29 @@ class IFF():
 
 	def getFirstTag(self, depth):
 		start = self.stack[depth].start + self.stack[depth].used
-		return self.data[start:start+4].decode('ASCII')
+		return str(self.data[start:start+4], 'ASCII')
+
+	def getFirstTagValue(self, depth):
+		return self.getHeaderValue(self.stack[depth].start + self.stack[depth].used)
+
+	def getHeaderValue(self, start):
+		# 0 past the end of the data, like decoding an empty slice would give
+		if start + 4 > len(self.data):
+			return 0
+		return tag_struct.unpack_from(self.data, start)[0]
 
 	def getLength(self, depth, offset = 0):
-		start = self.stack[depth].start + self.stack[depth].used + offset + 4
-		return int.from_bytes(self.data[start:start+4], 'big')
+		return self.getHeaderValue(self.stack[depth].start + self.stack[depth].used + offset + 4)
 
 	def getSecondTag(self, depth):
 		start = self.stack[depth].start + self.stack[depth].used + 8
-		return self.data[start:start+4].decode('ASCII') 
+		return str(self.data[start:start+4], 'ASCII')
+
+	def getSecondTagValue(self, depth):
+		return self.getHeaderValue(self.stack[depth].start + self.stack[depth].used + 8)
 
 	def enterChunk(self, name, validateName = True, optional = True):
-		if not self.inChunk and not self.atEndOfForm() and self.isCurrentChunk() and (not validateName or self.getFirstTag(self.stack_depth) == name):
+		if not self.inChunk and not self.atEndOfForm() and self.isCurrentChunk() and (not validateName or self.getFirstTagValue(self.stack_depth) == tag_value(name)):
 			self.stack.append(StackFrame(self.stack[self.stack_depth].start +self.stack[self.stack_depth].used + 4 + 4, self.getLength(self.stack_depth), 0))
 
 			#Debug.LogFormat("[EnterChunk: {4}] StackDepth: {0} Start: {1} Length: {2} Used: {3}", stackDepth, stack[stackDepth].start, stack[stackDepth].length, stack[stackDepth].used, getFirstTag(stackDepth));
@@ -132,7 +222,7 @@ class IFF():
 
 			return True
 		
-		elif (validateName and (self.getSecondTag(self.stack_depth) != name)):
+		elif (validateName and (self.getSecondTagValue(self.stack_depth) != tag_value(name))):
 			print(f"[EnterChunk]: FORM Name: {self.getFirstTag(self.stack_depth)} doesnt match requested: {name}")
 
 		return False
@@ -141,7 +231,7 @@ class IFF():
 
 	def enterForm(self, name, validateName = True, optional = True):
 		#print(f"Trying to enter form with: self.inChunk: {self.inChunk} self.atEndOfForm(): {self.atEndOfForm()} self.isCurrentForm(): {self.isCurrentForm()}")
-		if not self.inChunk and not self.atEndOfForm() and self.isCurrentForm() and (not validateName or (self.getSecondTag(self.stack_depth) == name)):
+		if not self.inChunk and not self.atEndOfForm() and self.isCurrentForm() and (not validateName or (self.getSecondTagValue(self.stack_depth) == tag_value(name))):
 			s = StackFrame(self.stack[self.stack_depth].start +self.stack[self.stack_depth].used + 4 + 4 + 4, self.getLength(self.stack_depth) - 4, 0)
 			self.stack.append(s)
 			#print(f'Stack now: {str(self.stack)}')
@@ -149,7 +239,7 @@ class IFF():
 
 			self.stack_depth += 1
 			return True
-		elif validateName and (self.getSecondTag(self.stack_depth) != name):
+		elif validateName and (self.getSecondTagValue(self.stack_depth) != tag_value(name)):
 			print(f"[EnterForm]: FORM Name: {self.getSecondTag(self.stack_depth)} doesn't match requested: {name}")
 		else:
 			print(f"Got to weird part of enterForm. self.inChunk: {self.inChunk} self.atEndOfForm(): {self.atEndOfForm()} self.isCurrentForm(): {self.isCurrentForm()}")
@@ -157,19 +247,27 @@ class IFF():
 		return False	
 
 	def exitForm(self, name = ""):
-		if name != "" and self.getSecondTag(self.stack_depth - 1) != name:
+		if name != "" and self.getSecondTagValue(self.stack_depth - 1) != tag_value(name):
 			print(f"[ExitForm] Requested: {name} but found {self.getSecondTag(self.stack_depth - 1)}")
 			return
 
+		if self.append_only:
+			s = self.stack[self.stack_depth]
+			self.data[s.start - 8:s.start - 4] = int.to_bytes(s.length + 4, 4, byteorder='big', signed=False)
+			self.stack[self.stack_depth - 1].length += s.length + 4 + 4 + 4
 		self.stack[self.stack_depth - 1].used += self.stack[self.stack_depth].length + 4 + 4 + 4
 		#//Debug.LogFormat("[ExitForm: {4}] StackDepth: {0} Start: {1} Length: {2} Used: {3}", stackDepth, stack[stackDepth].start, stack[stackDepth].length, stack[stackDepth].used, getSecondTag(stackDepth));
 		self.stack.pop()
 		self.stack_depth -= 1
 	def exitChunk(self, name):
-		if self.getFirstTag(self.stack_depth - 1) != name:
+		if self.getFirstTagValue(self.stack_depth - 1) != tag_value(name):
 			print(f"[ExitChunk] Requested: {self.getFirstTag(self.stack_depth - 1)} but found {name}")
 			return
 
+		if self.append_only:
+			s = self.stack[self.stack_depth]
+			self.data[s.start - 4:s.start] = int.to_bytes(s.length, 4, byteorder='big', signed=False)
+			self.stack[self.stack_depth - 1].length += s.length + 4 + 4
 		self.stack[self.stack_depth - 1].used += self.stack[self.stack_depth].length + 4 + 4
 		self.stack.pop()
 		self.stack_depth -= 1
@@ -207,18 +305,19 @@ class IFF():
 		return float(int.from_bytes(self.read_misc(1), byteorder='little', signed=False))/255.0
 
 	def read_byte(self):
-		return self.read_misc(1)
+		# A copy, so callers never hold on to a view of the mapped file
+		return bytes(self.read_misc(1))
 
 	def read_string(self):
 		s = self.stack[self.stack_depth]
 		pos = (s.start + s.used)
-		end = self.data.find(b'\0', pos)
+		end = (self.mapped if self.mapped != None else self.data).find(b'\0', pos)
 		if end != -1:
 			s.used += (end - pos) + 1
-			return self.data[pos:end].decode('ASCII')
+			return str(self.data[pos:end], 'ASCII')
 		else:
 			s.used = len(self.data) + 1 # definitely wrong, but shits broke anyway
-			return self.data[pos:].decode('ASCII')
+			return str(self.data[pos:], 'ASCII')
 
 	def read_float(self):
 		return struct.unpack('f', self.read_misc(4))[0]
@@ -229,15 +328,85 @@ class IFF():
 	def read_vector4(self):
 		return [self.read_float(), self.read_float(), self.read_float(), self.read_float()]
 	
+	def read_struct_array(self, dtype, count = None):
+		# Decodes count records of dtype (the rest of the current chunk when
+		# count is None) with a single frombuffer. The result is a writable copy
+		# so it stays valid after the file (or its mapping) is gone.
+		dtype = numpy.dtype(dtype)
+		s = self.stack[self.stack_depth]
+		if count == None:
+			count = (s.length - s.used) // dtype.itemsize
+		values = numpy.frombuffer(self.data, dtype=dtype, count=count, offset=s.start + s.used).copy()
+		s.used += count * dtype.itemsize
+		return values
+
+	def read_float_array(self, count = None):
+		return self.read_struct_array('<f4', count)
+
+	def read_int16_array(self, count = None):
+		return self.read_struct_array('<i2', count)
+
+	def read_uint16_array(self, count = None):
+		return self.read_struct_array('<u2', count)
+
+	def read_int32_array(self, count = None):
+		return self.read_struct_array('<i4', count)
+
+	def read_uint32_array(self, count = None):
+		return self.read_struct_array('<u4', count)
+
+	def build_index(self):
+		# Walks the block headers once and returns the root of a tree of IffNodes
+		# covering the whole file. Chunk payloads are never touched.
+		root = IffNode("", 0, len(self.data), True, None)
+		pending = [(root, 0, len(self.data))]
+		while len(pending) > 0:
+			parent, pos, end = pending.pop()
+			while pos + 8 <= end:
+				tag = str(self.data[pos:pos+4], 'ASCII')
+				length = int.from_bytes(self.data[pos+4:pos+8], 'big')
+				if pos + 8 + length > end:
+					print(f"[BuildIndex] {tag} at {pos} with length {length} runs past the end of its parent ({end})")
+					break
+				if tag == "FORM":
+					node = IffNode(str(self.data[pos+8:pos+12], 'ASCII'), pos, length, True, parent)
+					pending.append((node, pos + 12, pos + 8 + length))
+				else:
+					node = IffNode(tag, pos, length, False, parent)
+				parent.children.append(node)
+				pos += 8 + length
+		return root
+
+	def seek(self, node):
+		# Positions the reader in front of node (from build_index) so the next
+		# enterForm/enterChunk enters it, as if every block before it was skipped.
+		path = []
+		n = node
+		while n.parent != None:
+			path.append(n)
+			n = n.parent
+		self.stack = [StackFrame(0, len(self.data), 0)]
+		self.stack_depth = 0
+		self.inChunk = False
+		for n in reversed(path):
+			self.stack[self.stack_depth].used = n.offset - self.stack[self.stack_depth].start
+			if n is not node:
+				self.stack.append(StackFrame(n.dataOffset(), n.dataLength(), 0))
+				self.stack_depth += 1
+
+	def enterNode(self, node):
+		self.seek(node)
+		if node.is_form:
+			return self.enterForm(node.tag)
+		return self.enterChunk(node.tag)
+
 	def read_tag(self):
 		tag = ""
 		for i in range(4):
 			tag += chr(self.read_uint8())
 		return tag[::-1]
 	
-	def adjustDataAsNeeded(self, size):
-		neededLength = self.stack[0].length + size
-
+	def growDataAsNeeded(self, neededLength):
 		# check if we need to expand the data array
 		if neededLength > self.length:
 			newLength = 0
@@ -267,6 +436,9 @@ class IFF():
 			#print(f'Required length: {neededLength} is met by current length: {len(self.data)}')
 			pass
 
+	def adjustDataAsNeeded(self, size):
+		self.growDataAsNeeded(self.stack[0].length + size)
+
 		# move data around to either make room or remove data
 		offset = self.stack[self.stack_depth].start + self.stack[self.stack_depth].used
 		lengthToEnd = self.stack[0].length - offset
@@ -304,12 +476,32 @@ class IFF():
 					self.data[self.stack[i].start - 8:self.stack[i].start - 4] = size_bytes
    
 			
+	def appendBlock(self, header, isChunk, shouldEnter):
+		# The eager writer leaves the cursor in front of a block it doesn't enter,
+		# so whatever comes next lands before it. Appending can't put anything
+		# before what's already written, so that case is refused rather than
+		# quietly writing the blocks in a different order.
+		if not shouldEnter:
+			name = (header[0:4] if isChunk else header[8:12]).decode('ASCII')
+			raise ValueError(f"Error. Tried to insert '{name}' without entering it on an append only IFF")
+		s = self.stack[self.stack_depth]
+		offset = s.start + s.used
+		self.growDataAsNeeded(offset + len(header))
+		self.data[offset:offset+len(header)] = header
+		self.stack.append(StackFrame(offset + len(header), 0, 0))
+		self.stack_depth += 1
+		self.inChunk = isChunk
+
 	def insertForm(self, name, shouldEnterForm = True):
 		FORM_OVERHEAD = 4 + 4 + 4
 
 		if self.data == None:
 			self.data = bytearray(FORM_OVERHEAD) 
 
+		if self.append_only:
+			self.appendBlock(b'FORM' + int.to_bytes(4, 4, byteorder='big', signed=False) + name.encode('ASCII'), False, shouldEnterForm)
+			return
+
 		self.adjustDataAsNeeded(FORM_OVERHEAD)
 
 		#// compute the offset to start inserting data at
@@ -349,6 +541,10 @@ class IFF():
 
 	def insertChunk(self, name, shouldEnterChunk = True):
 		CHUNK_OVERHEAD = 4 + 4
+		if self.append_only:
+			self.appendBlock(name.encode('ASCII') + bytes(4), True, shouldEnterChunk)
+			return
+
 		#// make sure the data array can handle this addition
 		self.adjustDataAsNeeded(CHUNK_OVERHEAD)
 
@@ -372,6 +568,9 @@ class IFF():
 	def insertChunkData(self, newData):
 		if(len(newData) == 0):
 			return
+		if self.append_only:
+			self.appendData(newData)
+			return
 		self.adjustDataAsNeeded(len(newData))
 
 		offset = self.stack[self.stack_depth].start + self.stack[self.stack_depth].used
@@ -380,6 +579,14 @@ class IFF():
 
 		self.stack[self.stack_depth].used += len(newData)
 
+	def appendData(self, newData):
+		s = self.stack[self.stack_depth]
+		offset = s.start + s.used
+		self.growDataAsNeeded(offset + len(newData))
+		self.data[offset:offset+len(newData)] = newData
+		s.used += len(newData)
+		s.length += len(newData)
+
 	def insert_byte(self, b):
 		self.insertChunkData(int.to_bytes(b, 1, byteorder="little", signed=False))
 
@@ -430,16 +637,36 @@ class IFF():
 		self.insertChunkData(int.to_bytes(i, 4, byteorder="little", signed=False))
 	
 	def insert_color(self, color):
+		self.insertChunkData(IFF.color_bytes(color))
+
+	def color_bytes(color):
 		c = []
 		for i in range(4):
 			c.append(int(numpy.clip(color[i] * 255, 0, 255)))
-		self.insert_byte(c[2])
-		self.insert_byte(c[1])
-		self.insert_byte(c[0])
-		self.insert_byte(c[3])
 		#print(f"ARGB: {c[3]}, {c[0]}, {c[1]}, {c[2]}")
+		return bytes((c[2], c[1], c[0], c[3]))
+
+	def insertFloats(self, values):
+		self.insertNumpy(values, '<f4')
+
+	def insertStructArray(self, fmt, values):
+		# Packs every record in values with the struct format fmt (little endian
+		# unless fmt says otherwise) and inserts them all in one go.
+		if fmt[0] not in '@=<>!':
+			fmt = '<' + fmt
+		packer = struct.Struct(fmt)
+		self.insertChunkData(b''.join([packer.pack(*v) for v in values]))
+
+	def insertNumpy(self, values, dtype = None):
+		# Inserts the raw bytes of an array with a single copy. values must already
+		# be in the on-disk layout, or get converted to dtype first.
+		values = numpy.ascontiguousarray(values, dtype=dtype)
+		self.insertChunkData(memoryview(values.reshape(-1).view(numpy.uint8)))
 
 	def insertIff(self, iff):
+		if self.append_only:
+			self.appendData(iff.data[0:iff.stack[0].length])
+			return
 		#make sure the data array can handle this addition
 		newLength=iff.stack[0].length
 		self.adjustDataAsNeeded(newLength)
@@ -455,6 +682,9 @@ class IFF():
 		self.stack[self.stack_depth].used += newLength
 
 	def insertIffData(self, data):
+		if self.append_only:
+			self.appendData(data)
+			return
 		#make sure the data array can handle this addition
 		newLength=len(data)
 		self.adjustDataAsNeeded(newLength)
@@ -474,6 +704,9 @@ class IFF():
 		if not self.inChunk:
 			print("Error. Tried to call deleteChunkData while not in chunk")
 			return
+		if self.append_only:
+			print("Error. Tried to call deleteChunkData on an append only IFF")
+			return
 		self.adjustDataAsNeeded(-dataLength)
 
 
@@ -481,18 +714,42 @@ class IFF():
 	def seekWithinChunk(self, offset):
 		self.stack[self.stack_depth].used += offset
 
+	def overwriteChunkData(self, newData):
+		# Replaces len(newData) bytes at the cursor in place, so nothing after it
+		# moves and no lengths change. Can't grow the chunk.
+		s = self.stack[self.stack_depth]
+		if s.used + len(newData) > s.length:
+			print(f"Error. Tried to overwrite {len(newData)} bytes with only {s.length - s.used} left in the chunk")
+			return
+		if self.mapped != None:
+			print("Error. Tried to overwrite data in a memory mapped IFF")
+			return
+		if not isinstance(self.data, bytearray):
+			self.data = bytearray(self.data)
+		offset = s.start + s.used
+		self.data[offset:offset+len(newData)] = newData
+		s.used += len(newData)
+
+	def overwrite_int32(self, i):
+		self.overwriteChunkData(int.to_bytes(i, 4, byteorder="little", signed=True))
+
+	def overwriteFloat(self, f):
+		self.overwriteChunkData(struct.pack('f', f))
+
+	def overwriteNumpy(self, values, dtype = None):
+		values = numpy.ascontiguousarray(values, dtype=dtype)
+		self.overwriteChunkData(memoryview(values.reshape(-1).view(numpy.uint8)))
+
 	def update_int32(self, delta):
 		value = self.read_int32()
 		self.seekWithinChunk(-4)
-		self.deleteChunkData(4)
-		self.insert_int32(value + delta)
+		self.overwrite_int32(value + delta)
 		return value + delta
 
 	def update_float(self, delta):
 		value = self.read_float()
 		self.seekWithinChunk(-4)
-		self.deleteChunkData(4)
-		self.insertFloat(value + delta)
+		self.overwriteFloat(value + delta)
 		return value + delta
 
 	def update_vector3(self, dx, dy, dz):
@@ -500,32 +757,46 @@ class IFF():
 		y = self.read_float()
 		z = self.read_float()
 		self.seekWithinChunk(-12)
-		self.deleteChunkData(12)
-		self.insertFloat(x+dx)
-		self.insertFloat(y+dy)
-		self.insertFloat(z+dz)
+		self.overwriteFloat(x+dx)
+		self.overwriteFloat(y+dy)
+		self.overwriteFloat(z+dz)
 		return [x+dx, y+dy, z+dz]
 
+	def patchOpenBlocks(self):
+		# Append-only mode: write the lengths of every block that hasn't been
+		# exited yet, as if they were all closed right now. Returns the total size.
+		carried = 0
+		for i in range(self.stack_depth, 0, -1):
+			s = self.stack[i]
+			length = s.length + carried
+			if (i == self.stack_depth) and self.inChunk:
+				self.data[s.start - 4:s.start] = int.to_bytes(length, 4, byteorder='big', signed=False)
+				carried = length + 4 + 4
+			else:
+				self.data[s.start - 8:s.start - 4] = int.to_bytes(length + 4, 4, byteorder='big', signed=False)
+				carried = length + 4 + 4 + 4
+		return self.stack[0].length + carried
+
 	def write(self, file_path):
 		#print(f'self.length: {self.length} len(data): {len(self.data)} stack[0].length: {self.stack[0].length} stack[0].used: {self.stack[0].used}')
 		t = time.time()
+		total_length = self.patchOpenBlocks() if self.append_only else self.stack[0].length
 		f = builtins.open(file_path, 'wb')
-		f.write(self.data[0:self.stack[0].length])
+		f.write(self.data[0:total_length])
 		f.close()
 		now = time.time() 
 		#print("Writing data took: " + str(datetime.timedelta(seconds=(now - t))))
 
-	def calculate(self):
+	def calculate(self, start = 0, length = None):
 		print(f'Max size: {self.MAXINT}')
-		crc=0xFFFFFFFF
-		for d in self.data:
-			ind = self.int_overflow((crc>>24) ^ d) & 0xFF
-
-			#uind = int.from_bytes(ind.to_bytes(4, 'little', signed=True), 'little', signed=False)
-			temp = (self.crctable[ind] ^ (crc << 8))
-			crc = self.int_overflow(temp)
-			#print(f"{d}: Ind: {ind} Temp: {temp} CRC now {crc}")
-		return crc
+		if self.append_only:
+			self.patchOpenBlocks()
+		view = memoryview(self.data)
+		if length == None:
+			length = len(view) - start
+		crc = calculate_crc(view[start:start+length])
+		# the old byte loop left an empty range's register unsigned
+		return crc if length == 0 else self.int_overflow(crc)
 
 	def int_overflow(self, val):
 		if not -self.MAXINT-1 <= val <= self.MAXINT:
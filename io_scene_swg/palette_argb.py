@@ -1,18 +1,43 @@
-import builtins
+import builtins, os
+import numpy
+from . import tre_archive
 
 class PaletteArgb():
 	def __init__(self, filename = ""):
 		self.size = 0
-		self.colors = []
+		self.colors = numpy.zeros((0, 4), dtype=numpy.float32)
 		self.filename = filename
 		if filename != "":
-			file = builtins.open(filename, 'rb')
-			file.read(22)
-			self.size = int.from_bytes(file.read(2), byteorder='little', signed=True)
-			for i in range(self.size):
-				color = []
-				for c in range(3):
-					color.append(float(int.from_bytes(file.read(1), byteorder='little', signed=False))/255.0)
-				file.read(1)
-				self.colors.append(color)
-			file.close
+			if tre_archive.is_archive_path(filename):
+				data = tre_archive.read_file(filename)
+			else:
+				with builtins.open(filename, 'rb') as file:
+					data = file.read()
+			# 22 byte RIFF header, color count, then 4 bytes (r, g, b, flags) per color
+			if len(data) >= 24:
+				self.size = max(0, int.from_bytes(data[22:24], byteorder='little', signed=True))
+				self.size = min(self.size, (len(data) - 24) // 4)
+				self.colors = numpy.frombuffer(data, dtype=numpy.uint8, count=self.size * 4, offset=24).reshape(-1, 4) / numpy.float32(255.0)
+
+# Parsed palettes by path, as (mtime, palette). An entry is reused while the
+# file (or the .tre it's in) still has the mtime it had when it was parsed.
+palettes = {}
+
+def file_mtime(filename):
+	archive, name = tre_archive.split_path(filename)
+	try:
+		return os.path.getmtime(archive.path if archive != None else filename)
+	except OSError:
+		return None
+
+def get_palette(filename):
+	mtime = file_mtime(filename)
+	entry = palettes.get(filename)
+	if entry != None and entry[0] == mtime:
+		return entry[1]
+	palette = PaletteArgb(filename)
+	palettes[filename] = (mtime, palette)
+	return palette
+
+def clear():
+	palettes.clear()
@@ -1,4 +1,4 @@
-import os, bpy, math, mathutils
+import os, bpy, math, mathutils, concurrent.futures
 import numpy as np
 from bpy_extras.image_utils import load_image
 from bpy_extras import node_shader_utils
@@ -8,6 +8,9 @@ import bmesh
 
 from . import extents
 from . import swg_types
+from . import file_index
+from . import tre_archive
+from . import dds
 
 SWG_EFT_ALPHA = 1
 SWG_EFT_SPEC = 2
@@ -17,6 +20,12 @@ SWG_EFT_HUEMAP = 16
 SWG_EFT_HUEFULL = 32
 SWG_EFT_HUEMAP_RB = 64
 
+try:
+	# Optional, only for DDS formats the dds module can't decode
+	from PIL import Image as PILImage
+except ImportError:
+	PILImage = None
+
 def getChildren(myObject): 
 	children = [] 
 	for ob in bpy.data.objects: 
@@ -28,43 +37,234 @@ def clean_path(path):
 	return path.replace('\\', '/') if (os.sep == '/') else path.replace('/', '\\')
 
 def find_file(relative_path, root):
-	root=clean_path(root)
+	# root can hold several extract dirs separated by os.pathsep (or be a list),
+	# searched in order through the cached file_index.
 	relative_path=clean_path(relative_path)
-	if os.path.exists(os.path.join(root, relative_path)):
-		#print(f"Found {relative_path}! Returning: {os.path.join(root,relative_path)}")
-		return os.path.join(root,relative_path)
-	else:
-		#print(f"{os.path.join(root,relative_path)} doesn't exist!")
+	if isinstance(root, str) and (root == "" or os.path.isabs(relative_path)):
+		root=clean_path(root)
+		if os.path.exists(os.path.join(root, relative_path)):
+			#print(f"Found {relative_path}! Returning: {os.path.join(root,relative_path)}")
+			return os.path.join(root,relative_path)
+		else:
+			#print(f"{os.path.join(root,relative_path)} doesn't exist!")
+			return None
+	return file_index.get_index(root).find(relative_path)
+
+class ImportRegistry():
+	# Name -> datablock maps of the materials and images in the blend file, so
+	# importers don't rescan bpy.data for every SPS/PSDT and texture. Built once
+	# per import (begin_import) and kept current as the importers add to it.
+	def __init__(self):
+		self.materials = {m.name: m for m in bpy.data.materials}
+		self.images = {i.name: i for i in bpy.data.images}
+
+	def lookup(self, table, name):
+		item = table.get(name)
+		if item == None:
+			return None
+		try:
+			if item.name == name:
+				return item
+		except ReferenceError:
+			# Removed from the blend file since the registry was built
+			pass
+		del table[name]
 		return None
 
+	def material(self, name):
+		return self.lookup(self.materials, name)
+
+	def image(self, name):
+		return self.lookup(self.images, name)
+
+	def add_material(self, material):
+		self.materials[material.name] = material
+
+	def add_image(self, image):
+		self.images[image.name] = image
+
+import_registry = None
+
+def begin_import():
+	global import_registry
+	import_registry = ImportRegistry()
+	file_index.begin_session()
+	swg_types.SHADER_CACHE.revalidate()
+	return import_registry
+
+def end_import():
+	# Files found outside the cached indexes during the import are saved once, here
+	file_index.save_all()
+
+def get_import_registry():
+	if import_registry == None:
+		return begin_import()
+	return import_registry
+
+def find_or_create_material(name):
+	registry = get_import_registry()
+	material = registry.material(name)
+	if material == None:
+		material = bpy.data.materials.new(name)
+		registry.add_material(material)
+	return material
+
+def png_dir():
+	prefs = bpy.context.preferences.addons[__package__].preferences
+	return bpy.path.abspath(prefs.png_dir) if prefs.png_dir != "" else ""
+
+def texture_paths(texture, root):
+	# Returns (source image path, where its PNG goes). The PNG goes next to the
+	# source unless a PNG dir is set in the preferences. Textures read out of a
+	# .tre only have a temp copy to sit next to, so those go to Blender's user
+	# datafiles dir instead.
+	abs_path = find_file(texture, root)
+	if not abs_path:
+		return None, None
+	out_dir = png_dir()
+	if out_dir == "" and tre_archive.is_archive_path(abs_path):
+		out_dir = bpy.utils.user_resource('DATAFILES', path="swg_png", create=True)
+	abs_path = tre_archive.extract(abs_path)
+
+	if out_dir == "" or os.path.isabs(texture):
+		out_path = os.path.splitext(abs_path)[0] + ".png"
+	else:
+		out_path = os.path.join(out_dir, *file_index.normalize(os.path.splitext(texture)[0]).split('/')) + ".png"
+	return abs_path, out_path
+
+def png_is_current(abs_path, out_path):
+	# A converted PNG is stamped with its source's mtime, so a changed source
+	# shows up as a mismatch and gets converted again.
+	if abs_path == out_path:
+		return True
+	try:
+		return os.stat(out_path).st_mtime_ns == os.stat(abs_path).st_mtime_ns
+	except OSError:
+		return False
+
+def stamp_png(abs_path, out_path):
+	st = os.stat(abs_path)
+	os.utime(out_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+def convert_off_thread(abs_path, out_path):
+	# Safe on a worker thread: never touches bpy. Returns False when the format
+	# needs Blender, which then converts it on the main thread when it's loaded.
+	temp_path = out_path + ".tmp"
+	try:
+		os.makedirs(os.path.dirname(out_path), exist_ok=True)
+		try:
+			dds.convert(abs_path, temp_path)
+		except dds.UnsupportedFormat:
+			if PILImage == None:
+				return False
+			with PILImage.open(abs_path) as image:
+				image.save(temp_path, "PNG")
+		os.replace(temp_path, out_path)
+		stamp_png(abs_path, out_path)
+		return True
+	except Exception as e:
+		print(f"Couldn't convert {abs_path} to PNG: {e}")
+		return False
+
+def convert_with_blender(abs_path, out_path):
+	os.makedirs(os.path.dirname(out_path), exist_ok=True)
+	temp = load_image(abs_path, ".")
+	temp.file_format = "PNG"
+	temp.save_render(out_path)
+	bpy.data.images.remove(temp)
+	stamp_png(abs_path, out_path)
+
+def shader_textures(shader):
+	return [t for t in [shader.main, shader.hueb, shader.specular, shader.compressed_normal, shader.normal, shader.emission] if t]
+
+def convert_textures(shaders, root):
+	# Finds every texture the shaders use whose PNG is missing or stale and
+	# converts them all at once on a worker pool, so load_shared_image only
+	# has to load them.
+	jobs = {}
+	for shader in shaders:
+		for texture in shader_textures(shader):
+			abs_path, out_path = texture_paths(texture, root)
+			if abs_path and not png_is_current(abs_path, out_path):
+				jobs[abs_path] = out_path
+
+	if len(jobs) == 0:
+		return
+
+	print(f"Converting {len(jobs)} textures to PNG")
+	with concurrent.futures.ThreadPoolExecutor() as pool:
+		list(pool.map(convert_off_thread, jobs.keys(), jobs.values()))
+
+def gather_shaders(filepaths, root):
+	# Walks MSH/MGN/LOD/POB/APT files (and everything they reference) through
+	# their headers and returns the parsed shaders of every mesh in them, so an
+	# operator can convert all the textures of an import in one pass.
+	probes = {'.msh': swg_types.SWGMesh.probe, '.mgn': swg_types.SWGMgn.probe, '.lod': swg_types.LodFile.probe, '.pob': swg_types.PobFile.probe}
+	shader_paths = {}
+	pending = list(filepaths)
+	seen = set()
+	while len(pending) > 0:
+		path = pending.pop()
+		if path in seen:
+			continue
+		seen.add(path)
+		ext = os.path.splitext(path)[1].lower()
+		try:
+			if ext == '.apt':
+				apt = swg_types.AptFile(path)
+				apt.load()
+				references = [apt.reference] if apt.reference != "" else []
+				shaders = []
+			elif ext in probes:
+				info = probes[ext](path)
+				references = info.references
+				shaders = info.shaders
+				if ext == '.lod':
+					# LOD children are named relative to appearance/
+					references = [r if r.lower().startswith("appearance") else os.path.join("appearance", r) for r in references]
+			else:
+				continue
+		except Exception as e:
+			print(f"Couldn't read {path} for textures: {e}")
+			continue
+
+		for shader in shaders:
+			if shader not in shader_paths:
+				shader_paths[shader] = find_file(shader, root)
+		for reference in references:
+			if os.path.splitext(reference)[1].lower() in ['.msh', '.mgn', '.lod', '.apt']:
+				reference_path = find_file(reference, root)
+				if reference_path:
+					pending.append(reference_path)
+
+	return [swg_types.SHADER_CACHE.get(p, root) for p in shader_paths.values() if p]
+
+def prepare_textures(filepaths, root):
+	if bpy.context.preferences.addons[__package__].preferences.convert_tex_to_png:
+		convert_textures(gather_shaders(filepaths, root), root)
+
 def load_shared_image(path, root, convert_to_png = False):   
-	abs_path = find_file(path, root)
+	abs_path, png_path = texture_paths(path, root)
 	if not abs_path:
 		print (f"Error! Couldn't find image: {path}")
 		return None
 
 	out_path = abs_path
 	if convert_to_png:
-		out_path = abs_path.replace(".dds",".png")
+		out_path = png_path
 	
-	image = None
-
+	registry = get_import_registry()
 	shortname = os.path.basename(out_path)
-	for img in bpy.data.images: 
-		if shortname == img.name:
-			image = img
-			print(f"Found image: shortname at {abs_path}. Already is: {img.name}. Has data? {img.has_data}")
-			break
-	
-	if image == None:
-		if convert_to_png:
-			temp = load_image(abs_path, ".")
-			temp.file_format = "PNG"
-			temp.save_render(out_path)
-			bpy.data.images.remove(temp)
+	image = registry.image(shortname)
+	if image != None:
+		print(f"Found image: shortname at {abs_path}. Already is: {image.name}. Has data? {image.has_data}")
+	else:
+		if convert_to_png and not png_is_current(abs_path, out_path):
+			convert_with_blender(abs_path, out_path)
 		
 		image = load_image(out_path, ".")
 		image.alpha_mode = "CHANNEL_PACKED"
+		registry.add_image(image)
 	
 	return image
 
@@ -20,7 +20,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 from audioop import cross
-import math
+import math, os, collections
 from re import I
 from sys import maxsize
 from xml.dom import minidom
@@ -29,11 +29,52 @@ from . import nsg_iff
 from . import palette_argb
 from . import vertex_buffer_format
 from . import extents
+import numpy
 import mathutils
 from mathutils import Vector
 
 SWG_ROOT=None
 
+class AssetInfo(object):
+	# What the probe() functions return: the header level facts about an asset,
+	# read from its INFO/NAME/CNT style chunks without decoding any geometry.
+	__slots__ = ('path', 'form', 'version', 'counts', 'shaders', 'extents', 'hardpoints', 'references')
+	def __init__(self, path, form):
+		self.path = path
+		self.form = form
+		self.version = None
+		self.counts = {}
+		self.shaders = []
+		self.extents = None
+		self.hardpoints = []
+		self.references = []
+
+	def __str__(self):
+		return f"{self.form} {self.version} Path: {self.path} Counts: {self.counts} Shaders: {len(self.shaders)} Hardpoints: {len(self.hardpoints)} References: {self.references}"
+
+	def __repr__(self):
+		return self.__str__()
+
+	def read_appearance(self, iff, appr):
+		# APPR/0003: extents, (collision), HPTS, FLOR
+		if appr == None or len(appr.children) == 0 or appr.children[0].tag != "0003":
+			return
+		parts = appr.children[0].children
+		if len(parts) > 0:
+			iff.seek(parts[0])
+			self.extents = extents.Extents.create(iff)
+		for hpnt in appr.find_all("0003/HPTS/HPNT"):
+			iff.enterNode(hpnt)
+			iff.seekWithinChunk(12 * 4)
+			self.hardpoints.append(iff.read_string())
+		flor = appr.find("0003/FLOR/DATA")
+		if flor != None and flor.length > 1:
+			iff.enterNode(flor)
+			# has floor, then the floor path
+			if iff.read_bool8():
+				self.references.append(iff.read_string())
+
+
 class SktFile(object):
 	__slots__ = (
 		'path', 
@@ -78,11 +119,12 @@ class SktFile(object):
 			if sktm_id >= sktm_ct or sktm_id < 0:
 				return False
 			
-			# Loop through SKTMs to find the one we're looking for
+			# Jump straight to the SKTM we're looking for
+			sktms = iff.build_index().find_all(f"SLOD/{version}/SKTM")
+			if sktm_id >= len(sktms):
+				return False
+			iff.seek(sktms[sktm_id])
 			iff.enterForm("SKTM")
-			for i in range(sktm_id):
-				iff.exitForm("SKTM")
-				iff.enterForm("SKTM")
 			
 			sktm_version=iff.getCurrentName()
 			if sktm_version in ['0002']:
@@ -245,6 +287,8 @@ class PathGraphEdge(object):
 
 class PathGraph(object):
 	__slots__ = ('nodes', 'edges', 'pathGraphType')
+	node_dtype = numpy.dtype([('index', '<i4'), ('id', '<i4'), ('key', '<i4'), ('type', '<i4'), ('position', '<f4', (3,)), ('radius', '<f4')])
+	edge_dtype = numpy.dtype([('indexA', '<i4'), ('indexB', '<i4'), ('widthRight', '<f4'), ('widthLeft', '<f4')])
 	def __init__(self):
 		self.nodes = []
 		self.edges = []
@@ -263,25 +307,27 @@ class PathGraph(object):
 			iff.enterChunk("PNOD")
 			count = iff.read_int32()
 			print(f"PGRF node count {count}")
-			while not iff.atEndOfForm():
+			pnod = iff.read_struct_array(PathGraph.node_dtype)
+			for index, id, key, type, position, radius in zip(*[pnod[name].tolist() for name in PathGraph.node_dtype.names]):
 				node = PathGraphNode()
-				node.index = iff.read_int32()
-				node.id = iff.read_int32()
-				node.key = iff.read_int32()
-				node.type = iff.read_int32()
-				node.position = iff.read_vector3()
-				node.radius = iff.read_float()
+				node.index = index
+				node.id = id
+				node.key = key
+				node.type = type
+				node.position = position
+				node.radius = radius
 				self.nodes.append(node)
 			iff.exitChunk("PNOD")
 
 			iff.enterChunk("PEDG")
 			count = iff.read_int32()
-			while not iff.atEndOfForm():
+			pedg = iff.read_struct_array(PathGraph.edge_dtype)
+			for indexA, indexB, widthRight, widthLeft in zip(*[pedg[name].tolist() for name in PathGraph.edge_dtype.names]):
 				edge = PathGraphEdge()
-				edge.indexA = iff.read_int32()
-				edge.indexB = iff.read_int32()
-				edge.widthRight = iff.read_float()
-				edge.widthLeft = iff.read_float()
+				edge.indexA = indexA
+				edge.indexB = indexB
+				edge.widthRight = widthRight
+				edge.widthLeft = widthLeft
 				self.edges.append(edge)
 			iff.exitChunk("PEDG")
 
@@ -300,22 +346,12 @@ class PathGraph(object):
 		
 		iff.insertChunk("PNOD")
 		iff.insert_int32(len(self.nodes))
-		for node in self.nodes:
-			iff.insert_int32(node.index)
-			iff.insert_int32(node.id)
-			iff.insert_int32(node.key)			
-			iff.insert_int32(node.type)
-			iff.insertFloatVector3(node.position)
-			iff.insertFloat(node.radius)
+		iff.insertStructArray('4i3ff', [(node.index, node.id, node.key, node.type, *node.position, node.radius) for node in self.nodes])
 		iff.exitChunk("PNOD")
 		
 		iff.insertChunk("PEDG")
 		iff.insert_int32(len(self.edges))
-		for edge in self.edges:
-			iff.insert_int32(edge.indexA)
-			iff.insert_int32(edge.indexB)
-			iff.insertFloat(edge.widthRight)
-			iff.insertFloat(edge.widthLeft)
+		iff.insertStructArray('2i2f', [(edge.indexA, edge.indexB, edge.widthRight, edge.widthLeft) for edge in self.edges])
 		iff.exitChunk("PEDG")
 
 		edgeCounts = [0]*len(self.nodes)
@@ -328,14 +364,12 @@ class PathGraph(object):
 
 		iff.insertChunk("ECNT")
 		iff.insert_int32(len(edgeCounts))
-		for ec in edgeCounts:
-			iff.insert_int32(ec)
+		iff.insertNumpy(edgeCounts, '<i4')
 		iff.exitChunk("ECNT")
 
 		iff.insertChunk("ESTR")
 		iff.insert_int32(len(edgeStarts))
-		for es in edgeStarts:
-			iff.insert_int32(es)
+		iff.insertNumpy(edgeStarts, '<i4')
 		iff.exitChunk("ESTR")
 
 		iff.exitForm("0001")
@@ -390,7 +424,7 @@ class PobFile(object):
 		self.ship = False
 
 	def write(self, fullpath):
-		iff = nsg_iff.IFF(initial_size=512000)	  
+		iff = nsg_iff.IFF(initial_size=512000, append_only=True)	  
 		iff.insertForm("PRTO")
 		iff.insertForm("0004")
 		iff.insertChunk("DATA")
@@ -505,9 +539,43 @@ class PobFile(object):
 		iff.exitForm("PRTO")
 		iff.write(fullpath)
 
+	@staticmethod
+	def probe(filename):
+		with nsg_iff.IFF(filename=filename, use_mmap=True) as iff:
+			root = iff.build_index()
+			info = AssetInfo(filename, "PRTO")
+			version = root.find("PRTO/*")
+			if version != None:
+				info.version = version.tag
+				data = version.find("DATA")
+				if data != None:
+					iff.enterNode(data)
+					info.counts['portals'] = iff.read_int32()
+					info.counts['cells'] = iff.read_int32()
+				info.counts['unread_cells'] = 0
+				for cell in version.find_all("CELS/CELL"):
+					# Only CELL 0005 is understood (same as load()); the rest are counted and reported
+					cell_version = cell.children[0].tag if len(cell.children) > 0 else None
+					data = cell.find("0005/DATA")
+					if cell_version != "0005" or data == None:
+						print(f"{filename}: unhandled CELL version {cell_version}, its references are not in the probe")
+						info.counts['unread_cells'] += 1
+						continue
+					iff.enterNode(data)
+					iff.read_int32()
+					iff.read_bool8()
+					iff.read_string()
+					info.references.append(iff.read_string())
+					if iff.read_bool8():
+						info.references.append(iff.read_string())
+		return info
+
 	def load(self):
 		print(f"Loading pob from {self.filename}")
-		iff = nsg_iff.IFF(filename=self.filename)
+		with nsg_iff.IFF(filename=self.filename, use_mmap=True) as iff:
+			return self.read_iff(iff)
+
+	def read_iff(self, iff):
 		iff.enterForm("PRTO")
 		version = iff.getCurrentName()
 		if version in ["0004", "0003"]:
@@ -649,13 +717,11 @@ class PobFile(object):
 			tris=[]
 
 			iff.enterChunk("VERT")
-			while not iff.atEndOfForm():
-				verts.append(Vector([iff.read_float(), iff.read_float(), iff.read_float()]))
+			verts = [Vector(v) for v in iff.read_float_array().reshape(-1, 3).tolist()]
 			iff.exitChunk("VERT")
 			
 			iff.enterChunk("INDX")
-			while not iff.atEndOfForm():
-				tris.append(Triangle(iff.read_int32(),iff.read_int32(),iff.read_int32()))
+			tris = [Triangle(*t) for t in iff.read_int32_array().reshape(-1, 3).tolist()]
 			iff.exitChunk("INDX")
 
 			iff.exitForm("0000")
@@ -673,8 +739,7 @@ class PobFile(object):
 
 			iff.enterChunk("PRTL")
 			num_verts = iff.read_int32()
-			while not iff.atEndOfForm():
-				verts.append(Vector([iff.read_float(), iff.read_float(), iff.read_float()]))
+			verts = [Vector(v) for v in iff.read_float_array().reshape(-1, 3).tolist()]
 			iff.exitChunk("PRTL")
 
 			for i in range(2, num_verts):
@@ -707,7 +772,10 @@ class LodFile(object):
 		return self.__str__()
 
 	def load(self, path):
-		iff = nsg_iff.IFF(filename=path)
+		with nsg_iff.IFF(filename=path, use_mmap=True) as iff:
+			return self.read_iff(iff)
+
+	def read_iff(self, iff):
 		#print(f"Name: {iff.getCurrentName()} Length: {iff.getCurrentLength()}")
 		
 		top = iff.getCurrentName()
@@ -828,6 +896,24 @@ class LodFile(object):
 
 		return True
 
+	@staticmethod
+	def probe(path):
+		with nsg_iff.IFF(filename=path, use_mmap=True) as iff:
+			root = iff.build_index()
+			info = AssetInfo(path, "DTLA")
+			version = root.find("DTLA/*")
+			if version != None:
+				info.version = version.tag
+				info.read_appearance(iff, version.find("APPR"))
+				lods = version.find("INFO")
+				if lods != None:
+					info.counts['lods'] = lods.dataLength() // 12
+				for chld in version.find_all("DATA/CHLD"):
+					iff.enterNode(chld)
+					iff.read_uint32()
+					info.references.append(iff.read_string())
+		return info
+
 	def write(self, fullpath):
 		iff = nsg_iff.IFF(initial_size=512000)	  
 		iff.insertForm("DTLA")
@@ -934,13 +1020,11 @@ class IndexedTriangleList(object):
 			iff.enterForm(version)
 			
 			iff.enterChunk("VERT")
-			while not iff.atEndOfForm():
-				self.verts.append(iff.read_vector3())
+			self.verts.extend(iff.read_float_array().reshape(-1, 3).tolist())
 			iff.exitChunk("VERT")
 
 			iff.enterChunk("INDX")
-			while not iff.atEndOfForm():
-				self.indexes.append([iff.read_int32(),iff.read_int32(),iff.read_int32()])
+			self.indexes.extend(iff.read_int32_array().reshape(-1, 3).tolist())
 			iff.exitChunk("INDX")
 			iff.exitForm(version)
 			iff.exitForm("IDTL")
@@ -951,13 +1035,11 @@ class IndexedTriangleList(object):
 		iff.insertForm("0000")
 
 		iff.insertChunk("VERT")
-		for v in self.verts:
-			iff.insertFloatVector3(v)
+		iff.insertFloats([v[0:3] for v in self.verts])
 		iff.exitChunk("VERT")
 
 		iff.insertChunk("INDX")
-		for i in self.indexes:
-			iff.insertInt32Vector3(i)
+		iff.insertNumpy([i[0:3] for i in self.indexes], '<i4')
 		iff.exitChunk("INDX")
 
 		iff.exitForm("0000")
@@ -969,6 +1051,16 @@ class FloorTri(object):
 	WallBase = 2
 	WallTop = 3
 	__slots__ = ('corner1','corner2','corner3','index','nindex1','nindex2','nindex3','normal','edgeType1','edgeType2','edgeType3','fallthrough','partTag','portalId1','portalId2','portalId3')
+	dtype_0002 = numpy.dtype([
+		('corners', '<i4', (3,)),
+		('index', '<i4'),
+		('nindexes', '<i4', (3,)),
+		('normal', '<f4', (3,)),
+		('edgeTypes', 'u1', (3,)),
+		('fallthrough', 'u1'),
+		('partTag', '<i4'),
+		('portalIds', '<i4', (3,)),
+	])
 	def __init__(self):
 		self.corner1 = 0
 		self.corner2 = 0
@@ -1021,6 +1113,28 @@ class FloorTri(object):
 		self.portalId2 = iff.read_int32()
 		self.portalId3 = iff.read_int32()
 
+	@staticmethod
+	def read_0002_array(iff, count):
+		tris = []
+		records = iff.read_struct_array(FloorTri.dtype_0002, count)
+		for corners, index, nindexes, normal, edgeTypes, fallthrough, partTag, portalIds in zip(*[records[name].tolist() for name in FloorTri.dtype_0002.names]):
+			f = FloorTri()
+			f.corner1, f.corner2, f.corner3 = corners
+			f.index = index
+			f.nindex1, f.nindex2, f.nindex3 = nindexes
+			f.normal = normal
+			f.edgeType1, f.edgeType2, f.edgeType3 = edgeTypes
+			f.fallthrough = (fallthrough != 0)
+			f.partTag = partTag
+			f.portalId1, f.portalId2, f.portalId3 = portalIds
+			tris.append(f)
+		return tris
+
+	@staticmethod
+	def write_0002_array(iff, tris):
+		iff.insertStructArray('3ii3i3f3bBi3i', [(t.corner1, t.corner2, t.corner3, t.index, t.nindex1, t.nindex2, t.nindex3, *t.normal[0:3],
+			t.edgeType1, t.edgeType2, t.edgeType3, 1 if t.fallthrough else 0, t.partTag, t.portalId1, t.portalId2, t.portalId3) for t in tris])
+
 	def write_0002(self, iff):
 		iff.insert_int32(self.corner1)
 		iff.insert_int32(self.corner2)
@@ -1082,18 +1196,12 @@ class FloorFile(object):
 			
 			iff.enterChunk("VERT")
 			vertCount = iff.read_int32()
-			while not iff.atEndOfForm():
-				pos = iff.read_vector3()
-				self.verts.append(pos)
+			self.verts.extend(iff.read_float_array().reshape(-1, 3).tolist())
 			iff.exitChunk("VERT")
 
 			iff.enterChunk("TRIS")
 			triCount = iff.read_int32()
-			for i in range(0, triCount):
-				#print(f"Tri {i}:")
-				f = FloorTri()
-				f.read_0002(iff)
-				self.tris.append(f)
+			self.tris.extend(FloorTri.read_0002_array(iff, triCount))
 			iff.exitChunk("TRIS")
 
 			if not iff.atEndOfForm() and iff.getCurrentName() == "BTRE":
@@ -1116,20 +1224,18 @@ class FloorFile(object):
 		return True
 
 	def write(self):
-		iff = nsg_iff.IFF(initial_size=512000)
+		iff = nsg_iff.IFF(initial_size=512000, append_only=True)
 		iff.insertForm("FLOR")
 		iff.insertForm("0006")
 
 		iff.insertChunk("VERT")
 		iff.insert_int32(len(self.verts))
-		for v in self.verts:
-			iff.insertFloatVector3(v)
+		iff.insertFloats([v[0:3] for v in self.verts])
 		iff.exitChunk("VERT")
 
 		iff.insertChunk("TRIS")
 		iff.insert_int32(len(self.tris))
-		for t in self.tris:
-			t.write_0002(iff)
+		FloorTri.write_0002_array(iff, self.tris)
 		iff.exitChunk("TRIS")
 
 		borderEdges = []
@@ -1142,8 +1248,7 @@ class FloorFile(object):
 				borderEdges.append(PathEdge(index, 2, (tri.edgeType1 != FloorTri.Uncrossable)))
 		iff.insertChunk("BEDG")
 		iff.insert_int32(len(borderEdges))
-		for be in borderEdges:
-			be.write(iff)
+		iff.insertStructArray('2i?', [(be.tri, be.edge, be.crossable) for be in borderEdges])
 		iff.exitChunk("BEDG")
 
 		if self.pathGraph != None:
@@ -1385,7 +1490,7 @@ class MgnHardpoint(object):
 		return self.__str__()
 
 class SWGVertex(object):
-	__slots = ('pos', 'normal', 'color', 'texs')
+	__slots__ = ('pos', 'normal', 'color0', 'color1', 'texs')
 	def __init__(self):
 		self.texs = []
 		self.pos = None
@@ -1488,14 +1593,14 @@ class SWGShader(object):
 						pal_path = support.find_file(pal_path, self.root)
 						print(f"Looking for palette: {pal_path}")
 						if pal_path:
-							palette = palette_argb.PaletteArgb(pal_path)
+							palette = palette_argb.get_palette(pal_path)
 							pal_idx = iff.read_int32()
 							# The h_color2w_rb shaders use HUEB for both index colors
 							# We use the tag instead of the Variable Name because we can't guarantee consistency in variable assignment to texture tags
 							if tag in self.palette_colors:
 								tag = tag + "2"
 							if palette.size > pal_idx:
-								self.palette_colors[tag] = palette.colors[pal_idx]
+								self.palette_colors[tag] = palette.colors[pal_idx][:3].tolist()
 							else:
 								self.palette_colors[tag] = [1.0,1.0,1.0]
 						iff.exitChunk("PAL ")
@@ -1590,26 +1695,175 @@ class SWGShader(object):
 				self.effect = iff.read_string()
 				iff.exitChunk("NAME")
 
-class SPS(object):
-	__slots__ = ('no', 'shader', 'flags', 'verts', 'tris', 'full_shader_path', 'real_shader')
-	def __init__(self):
-		self.no = 0
-		self.shader = ""
-		self.flags = 0
-		self.verts = []
-		self.tris = []
-		self.full_shader_path = None
-		self.real_shader = None
+class ShaderCache(object):
+	# Bounded LRU of parsed SWGShaders shared across loads. An entry is reused
+	# while the .sht (or the .tre it's in) still has the mtime it had when it was
+	# parsed. Shaders that couldn't be found have no mtime and are never reused.
+	__slots__ = ('max_size', 'entries', 'hits', 'misses')
+	def __init__(self, max_size = 256):
+		self.max_size = max_size
+		self.entries = collections.OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def __str__(self):
+		return f"ShaderCache: {len(self.entries)}/{self.max_size} Hits: {self.hits} Misses: {self.misses}"
+
+	def __repr__(self):
+		return self.__str__()
 
-	def __init__(self, no , shader, flags, verts, tris):
+	def get(self, path, root):
+		key = (path, root)
+		mtime = palette_argb.file_mtime(path)
+		entry = self.entries.get(key)
+		if entry != None and mtime != None and entry[0] == mtime:
+			self.hits += 1
+			self.entries.move_to_end(key)
+			return entry[1]
+
+		self.misses += 1
+		shader = SWGShader(path, root)
+		if mtime == None:
+			self.entries.pop(key, None)
+			return shader
+		self.entries[key] = (mtime, shader)
+		self.entries.move_to_end(key)
+		while len(self.entries) > self.max_size:
+			self.entries.popitem(last=False)
+		return shader
+
+	def revalidate(self):
+		# Drops entries whose source changed or went away since they were parsed
+		for key, entry in list(self.entries.items()):
+			mtime = palette_argb.file_mtime(key[0])
+			if mtime == None or entry[0] != mtime:
+				del self.entries[key]
+		self.hits = 0
+		self.misses = 0
+
+	def clear(self):
+		self.entries.clear()
+		self.hits = 0
+		self.misses = 0
+
+SHADER_CACHE = ShaderCache()
+
+class SPS(object):
+	# Vertex data is kept column-wise, one NumPy array per VTXA field, and the
+	# triangles as an (N, 3) index array. verts/tris still work as per-vertex
+	# SWGVertex / Triangle lists for code that wants them, but build copies.
+	__slots__ = ('no', 'shader', 'flags', 'full_shader_path', 'real_shader', 'positions', 'normals', 'colors0', 'colors1', 'uvs', 'dot3', 'indices')
+	def __init__(self, no = 0, shader = "", flags = 0, verts = None, tris = None):
 		self.no = no
 		self.shader = shader
 		self.flags = flags
-		self.verts = verts
-		self.tris = tris
+		# Only build columns from objects when given some; loaders and the
+		# exporter fill the arrays directly.
+		if verts != None:
+			self.verts = verts
+		else:
+			self.set_vertex_array(None)
+		if tris != None:
+			self.tris = tris
+		else:
+			self.indices = numpy.zeros((0, 3), dtype=numpy.uint32)
 		self.full_shader_path = None
 		self.real_shader = None
 
+	@property
+	def verts(self):
+		return self.vertex_objects()
+
+	@verts.setter
+	def verts(self, verts):
+		self.set_vertex_objects(verts)
+
+	@property
+	def tris(self):
+		return [Triangle(*t) for t in self.indices.tolist()]
+
+	@tris.setter
+	def tris(self, tris):
+		self.indices = numpy.array([(t.p1, t.p2, t.p3) for t in tris], dtype=numpy.uint32).reshape(-1, 3)
+
+	def set_vertex_array(self, vertices):
+		# Splits a VTXA DATA chunk decoded with vertex_buffer_format.getDtype into
+		# one array per field. Colors are stored BGRA and become RGBA floats.
+		names = vertices.dtype.names if vertices is not None else ()
+		column = lambda name: numpy.ascontiguousarray(vertices[name]) if name in names else None
+		self.positions = column('position')
+		self.normals = column('normal')
+		self.colors0 = (vertices['color0'][:, [2, 1, 0, 3]].astype(numpy.float32) / 255.0) if 'color0' in names else None
+		self.colors1 = (vertices['color1'][:, [2, 1, 0, 3]].astype(numpy.float32) / 255.0) if 'color1' in names else None
+		self.uvs = [column(name) for name in names if name.startswith('uv')]
+		self.dot3 = column('dot3')
+
+	def vertex_count(self):
+		return max([len(c) for c in [self.positions, self.normals, self.colors0, self.colors1, self.dot3, *self.uvs] if c is not None], default=0)
+
+	def vertex_array(self):
+		# Inverse of set_vertex_array: packs the columns back into the VTXA layout
+		# for self.flags, ready to be written as one block. UV sets the flags
+		# declare but that have no column are left as zeros, so every vertex
+		# still has the stride the flags promise.
+		dtype = vertex_buffer_format.getDtype(self.flags)
+		vertices = numpy.zeros(self.vertex_count(), dtype=dtype)
+		names = dtype.names
+		if 'position' in names:
+			vertices['position'] = self.positions
+		if 'w' in names:
+			vertices['w'] = 1
+		if 'normal' in names:
+			vertices['normal'] = self.normals
+		if 'pointSize' in names:
+			vertices['pointSize'] = 1
+		for name, colors in [('color0', self.colors0), ('color1', self.colors1)]:
+			if name in names:
+				vertices[name] = numpy.clip(numpy.asarray(colors, dtype=numpy.float64)[:, [2, 1, 0, 3]] * 255, 0, 255).astype(numpy.uint8)
+		for i, uv in enumerate(self.uvs):
+			vertices[f'uv{i}'] = uv
+		if 'dot3' in names:
+			vertices['dot3'] = self.dot3
+		return vertices
+
+	def set_vertex_objects(self, verts):
+		# Fills the columns from a list of SWGVertex. The DOT3 tangent is the
+		# last entry of each vertex's texs, after the real UV sets.
+		num_uv_sets = self.getNumUVSets()
+		self.positions = numpy.array([v.pos[0:3] for v in verts], dtype=numpy.float32).reshape(-1, 3)
+		self.normals = numpy.array([v.normal[0:3] for v in verts], dtype=numpy.float32).reshape(-1, 3)
+		self.colors0 = numpy.array([v.color0[0:4] for v in verts], dtype=numpy.float32).reshape(-1, 4) if self.hasColor0() else None
+		self.colors1 = numpy.array([v.color1[0:4] for v in verts], dtype=numpy.float32).reshape(-1, 4) if self.hasColor1() else None
+		self.uvs = [numpy.array([v.texs[i] for v in verts], dtype=numpy.float32).reshape(-1, vertex_buffer_format.getTextureCoordinateSetDimension(self.flags, i)) for i in range(num_uv_sets)]
+		self.dot3 = numpy.array([v.texs[num_uv_sets] for v in verts], dtype=numpy.float32).reshape(-1, 4) if self.hasDOT3() else None
+
+	def index_array(self):
+		# On-disk INDX layout: 16 bit indices unless a vertex is out of their reach.
+		dtype = '<u2'
+		if len(self.indices) > 0 and self.indices.max() > 0xFFFF:
+			dtype = '<u4'
+		return numpy.ascontiguousarray(self.indices, dtype=dtype)
+
+	def vertex_objects(self):
+		count = self.vertex_count()
+		positions = self.positions.tolist() if self.positions is not None else [None] * count
+		normals = self.normals.tolist() if self.normals is not None else [None] * count
+		colors0 = self.colors0.tolist() if self.colors0 is not None else [None] * count
+		colors1 = self.colors1.tolist() if self.colors1 is not None else [None] * count
+		uvs = [uv.tolist() for uv in self.uvs]
+		if self.dot3 is not None:
+			uvs.append(self.dot3.tolist())
+		verts = [None] * count
+		for i in range(count):
+			v = SWGVertex()
+			v.pos = Vector(positions[i]) if positions[i] != None else None
+			v.normal = Vector(normals[i]) if normals[i] != None else None
+			v.color0 = colors0[i]
+			v.color1 = colors1[i]
+			v.texs = [uv[i] for uv in uvs]
+			verts[i] = v
+		return verts
+
 	def hasDOT3(self):
 		num_uv_sets = vertex_buffer_format.getNumberOfTextureCoordinateSets(self.flags)
 		if(num_uv_sets > 0):
@@ -1636,7 +1890,7 @@ class SPS(object):
 			return self.shader.split('/')[1].split('.')[0]
 
 	def __str__(self):
-		return f"SPS_No: {self.no} Shader: {self.shader} Flags: {self.flags} Verts: {len(self.verts)} Tris: {len(self.tris)}"
+		return f"SPS_No: {self.no} Shader: {self.shader} Flags: {self.flags} Verts: {self.vertex_count()} Tris: {len(self.indices)}"
 
 	def __repr__(self):
 		return self.__str__()
@@ -1695,119 +1949,106 @@ class SWGMesh(object):
 			print(f'Mesh: {self.filename} SPS: {sps_no} Flags: {flags}: Has Color1. Never seen that before! Not doing anything with it FYI')
 
 
-	def read_vertex(self, flags, iff):
-		v = SWGVertex()
-
-		num_uv_sets = vertex_buffer_format.getNumberOfTextureCoordinateSets(flags)
-		skip_dot3 = False
-		if(num_uv_sets > 0) and (vertex_buffer_format.getTextureCoordinateSetDimension(flags, num_uv_sets - 1) == 4):
-			skip_dot3 = True
-			num_uv_sets -= 1
-
-		v.texs = []
-
-		if vertex_buffer_format.hasPosition(flags):
-			v.pos =  Vector(iff.read_vector3())
-
-		if vertex_buffer_format.hasNormal(flags):
-			v.normal =  Vector(iff.read_vector3())
-
-		if vertex_buffer_format.hasPointSize(flags):
-			point_size = iff.read_float() # unused
-
-		if vertex_buffer_format.hasColor0(flags):
-			# NSG Seems like this should be ARGB per SOE code, but that makes 
-			# the Anchorhead Cantina look gross. Used trial and error to determine
-			# order: BGRA
-			b = iff.read_color()
-			g = iff.read_color()
-			r = iff.read_color()
-			a = iff.read_color()
-			v.color0 = [r,g,b,a]
-
-		if vertex_buffer_format.hasColor1(flags):
-			# NSG Seems like this should be ARGB per SOE code, but that makes 
-			# the Anchorhead Cantina look gross. Used trial and error to determine
-			# order: BGRA
-			b = iff.read_color()
-			g = iff.read_color()
-			r = iff.read_color()
-			a = iff.read_color()
-			v.color1 = [r,g,b,a]
-
-		for i in range(0, num_uv_sets):
-			dim = vertex_buffer_format.getTextureCoordinateSetDimension(flags, i)
-			v.texs.append([]) 
-			for j in range(0, dim):
-				v.texs[i].append(iff.read_float())
-
-		if skip_dot3:
-			iff.read_float()
-			iff.read_float()
-			iff.read_float()
-			iff.read_float()
-
-		return v
-
-	def update_vertex(self, flags, iff, dx, dy, dz):
-		v = SWGVertex()
-
-		num_uv_sets = vertex_buffer_format.getNumberOfTextureCoordinateSets(flags)
-		skip_dot3 = False
-		if(num_uv_sets > 0) and (vertex_buffer_format.getTextureCoordinateSetDimension(flags, num_uv_sets - 1) == 4):
-			skip_dot3 = True
-			num_uv_sets -= 1
-
-		v.texs = []
-
-		if vertex_buffer_format.hasPosition(flags):
-			x = iff.update_float(dx)
-			y = iff.update_float(dy)
-			z = iff.update_float(dz)
-			v.pos=Vector([x,y,z])
+	@staticmethod
+	def probe(filename):
+		with nsg_iff.IFF(filename=filename, use_mmap=True) as iff:
+			root = iff.build_index()
+			info = AssetInfo(filename, "MESH")
+			version = root.find("MESH/*")
+			if version != None:
+				info.version = version.tag
+				info.read_appearance(iff, version.find("APPR"))
+				info.counts = {'sps': 0, 'vertices': 0, 'indices': 0}
+				for sps in version.find_all("SPS /0001/*"):
+					if not sps.is_form:
+						continue
+					info.counts['sps'] += 1
+					name = sps.find("NAME")
+					if name != None:
+						iff.enterNode(name)
+						info.shaders.append(iff.read_string())
+					vtxa = sps.find("*/VTXA/0003/INFO")
+					if vtxa != None:
+						iff.enterNode(vtxa)
+						iff.read_int32()
+						info.counts['vertices'] += iff.read_uint32()
+					indx = sps.find("*/INDX")
+					if indx != None:
+						iff.enterNode(indx)
+						info.counts['indices'] += iff.read_uint32()
+				info.references.extend(info.shaders)
+		return info
+
+	def transform_vertices(self, matrix, filename = None):
+		# Applies matrix (4x4, or just a 3 element translation) to everything in
+		# the file on disk that is in mesh space: the position, normal and DOT3
+		# tangent of every vertex in every SPS, the hardpoints and the collision
+		# extents. The APPR extents are refit to the new positions. Everything is
+		# overwritten in place and written to filename (default: same file).
+		matrix = numpy.asarray(matrix, dtype=numpy.float64)
+		if matrix.shape == (3,):
+			translation = matrix
+			matrix = numpy.identity(4)
+			matrix[:3, 3] = translation
+		normal_matrix = numpy.linalg.inv(matrix[:3, :3])
+		# A mirroring matrix flips the bitangent, which DOT3 w carries
+		handedness = 1.0 if numpy.linalg.det(matrix[:3, :3]) >= 0 else -1.0
 
-		if vertex_buffer_format.hasNormal(flags):
-			v.normal =  Vector(iff.read_vector3())
+		iff = nsg_iff.IFF(filename=self.filename)
+		root = iff.build_index()
+		positions = []
+		for vtxa in root.find_all("MESH/*/SPS /0001/*/*/VTXA/0003"):
+			iff.seek(vtxa)
+			iff.enterForm("0003")
+			iff.enterChunk("INFO")
+			bit_flag = iff.read_int32()
+			num_verts = iff.read_uint32()
+			iff.exitChunk("INFO")
 
-		if vertex_buffer_format.hasPointSize(flags):
-			point_size = iff.read_float() # unused
-
-		if vertex_buffer_format.hasColor0(flags):
-			# NSG Seems like this should be ARGB per SOE code, but that makes 
-			# the Anchorhead Cantina look gross. Used trial and error to determine
-			# order: BGRA
-			b = iff.read_color()
-			g = iff.read_color()
-			r = iff.read_color()
-			a = iff.read_color()
-			v.color0 = [r,g,b,a]
+			iff.enterChunk("DATA")
+			vertices = iff.read_struct_array(vertex_buffer_format.getDtype(bit_flag), num_verts)
+			if 'position' in vertices.dtype.names:
+				vertices['position'] = vertices['position'] @ matrix[:3, :3].T + matrix[:3, 3]
+				positions.append(vertices['position'].astype(numpy.float64))
+			if 'normal' in vertices.dtype.names:
+				normals = vertices['normal'] @ normal_matrix
+				lengths = numpy.linalg.norm(normals, axis=1, keepdims=True)
+				vertices['normal'] = numpy.divide(normals, lengths, out=normals, where=(lengths > 0))
+			if 'dot3' in vertices.dtype.names:
+				tangents = vertices['dot3'][:, :3] @ matrix[:3, :3].T
+				lengths = numpy.linalg.norm(tangents, axis=1, keepdims=True)
+				vertices['dot3'][:, :3] = numpy.divide(tangents, lengths, out=tangents, where=(lengths > 0))
+				vertices['dot3'][:, 3] *= handedness
+			iff.seekWithinChunk(-vertices.nbytes)
+			iff.overwriteNumpy(vertices)
+			iff.exitChunk("DATA")
+			iff.exitForm("0003")
 
-		if vertex_buffer_format.hasColor1(flags):
-			# NSG Seems like this should be ARGB per SOE code, but that makes 
-			# the Anchorhead Cantina look gross. Used trial and error to determine
-			# order: BGRA
-			b = iff.read_color()
-			g = iff.read_color()
-			r = iff.read_color()
-			a = iff.read_color()
-			v.color1 = [r,g,b,a]
-
-		for i in range(0, num_uv_sets):
-			dim = vertex_buffer_format.getTextureCoordinateSetDimension(flags, i)
-			v.texs.append([]) 
-			for j in range(0, dim):
-				v.texs[i].append(iff.read_float())
-
-		if skip_dot3:
-			iff.read_float()
-			iff.read_float()
-			iff.read_float()
-			iff.read_float()
-
-		return v
+		appr = root.find("MESH/*/APPR/0003")
+		if appr != None:
+			for hpnt in appr.find_all("HPTS/HPNT"):
+				# 3x4 row major transform, then the name
+				iff.enterNode(hpnt)
+				frame = numpy.identity(4)
+				frame[:3] = iff.read_float_array(12).reshape(3, 4)
+				frame = matrix @ frame
+				# Keep the hardpoint's rotation a rotation when matrix scales
+				lengths = numpy.linalg.norm(frame[:3, :3], axis=0)
+				frame[:3, :3] = numpy.divide(frame[:3, :3], lengths, out=frame[:3, :3], where=(lengths > 0))
+				iff.seekWithinChunk(-48)
+				iff.overwriteNumpy(frame[:3], '<f4')
+			if len(appr.children) > 1:
+				extents.transform_in_place(iff, appr.children[1], matrix)
+			if len(appr.children) > 0 and len(positions) > 0:
+				extents.fit_in_place(iff, appr.children[0], numpy.concatenate(positions))
+
+		iff.write(filename if filename != None else self.filename)
 
 	def load(self):
-		iff = nsg_iff.IFF(filename=self.filename)
+		with nsg_iff.IFF(filename=self.filename, use_mmap=True) as iff:
+			return self.read_iff(iff)
+
+	def read_iff(self, iff):
 		#print(f"Name: {iff.getCurrentName()} Length: {iff.getCurrentLength()}")
 		iff.enterAnyForm()
 		version = iff.getCurrentName()
@@ -1895,13 +2136,10 @@ class SWGMesh(object):
 				bit_flag = iff.read_int32()
 				#self.debug_flags(bit_flag, sps_no)
 				num_verts = iff.read_uint32()
-				verts = [None] * num_verts
 				iff.exitChunk("INFO")
 
 				iff.enterChunk("DATA")
-				for i in range(0, num_verts):
-					verts[i] = self.read_vertex(bit_flag, iff)
-
+				vertices = iff.read_struct_array(vertex_buffer_format.getDtype(bit_flag), num_verts)
 				iff.exitChunk("DATA")
 				iff.exitForm("0003")
 
@@ -1909,33 +2147,28 @@ class SWGMesh(object):
 
 				size = iff.getCurrentLength()
 				iff.enterChunk("INDX")
-				indexes = []
+				indexes = numpy.zeros((0, 3), dtype=numpy.uint16)
 				index_count = iff.read_uint32()
-				bpi = (size - 4) // index_count
+				bpi = (size - 4) // index_count if index_count > 0 else 0
 				#print(f'Size: {size} Size - 4: {size - 4}, index_count: {index_count} bpi: {bpi}')
-				for i in range(index_count//3):
-					tri = Triangle()
-					if(bpi == 2):
-						tri.p1 = iff.read_int16()
-						tri.p2 = iff.read_int16()
-						tri.p3 = iff.read_int16()
-					elif(bpi == 4):
-						tri.p1 = iff.read_int32()
-						tri.p2 = iff.read_int32()
-						tri.p3 = iff.read_int32()
-					indexes.append(tri)
+				if(bpi == 2):
+					indexes = iff.read_uint16_array((index_count // 3) * 3).reshape(-1, 3)
+				elif(bpi == 4):
+					indexes = iff.read_uint32_array((index_count // 3) * 3).reshape(-1, 3)
 				#print(f'Read Index Count: {index_count}')
 
 				iff.exitChunk("INDX")
 				iff.exitForm(version)
-				print(f"SPS {sps_no} Shader: {sht} Version: {version} Verts: {len(verts)} Tris: {len(indexes)}")
+				print(f"SPS {sps_no} Shader: {sht} Version: {version} Verts: {len(vertices)} Tris: {len(indexes)}")
 
-				sps = SPS(sps_no, sht, bit_flag, verts, indexes)
+				sps = SPS(sps_no, sht, bit_flag)
+				sps.set_vertex_array(vertices)
+				sps.indices = indexes
 
 				real_shader_path = support.find_file(sps.shader, SWG_ROOT)
 				if real_shader_path:
 					sps.full_shader_path = real_shader_path
-					sps.real_shader = SWGShader(sps.full_shader_path, SWG_ROOT)
+					sps.real_shader = SHADER_CACHE.get(sps.full_shader_path, SWG_ROOT)
 				else:
 					print(f"Couldn't locate real shader path for: {sps.shader}")
 				self.spss.append(sps)
@@ -1948,7 +2181,7 @@ class SWGMesh(object):
 		return True
 			
 	def write(self, filename):
-		iff = nsg_iff.IFF(initial_size=512000)
+		iff = nsg_iff.IFF(initial_size=512000, append_only=True)
 		# - BEGIN MESH		
 		iff.insertForm("MESH")
 		iff.insertForm("0005")
@@ -2027,40 +2260,17 @@ class SWGMesh(object):
 			#iff.insert_uint32(4357)
 			#iff.insert_uint32(53765)
 			iff.insert_uint32(sps.flags)
-			self.debug_flags(sps.flags, i)
-			iff.insert_uint32(len(sps.verts))
+			iff.insert_uint32(sps.vertex_count())
 			iff.exitChunk("INFO")
 			iff.insertChunk("DATA")
-			for v in sps.verts:
-				iff.insertFloatVector3((v.pos.x, v.pos.y, v.pos.z))
-
-				if vertex_buffer_format.isTransformed(sps.flags):
-					iff.insertFloat(1)
-				
-				iff.insertFloatVector3((v.normal.x, v.normal.y, v.normal.z))
-				
-				if vertex_buffer_format.hasPointSize(sps.flags):
-					iff.insertFloat(1)
-
-				if vertex_buffer_format.hasColor0(sps.flags):
-					iff.insert_color(v.color0)
-
-				if vertex_buffer_format.hasColor1(sps.flags):
-					iff.insert_color(v.color1)
-				
-				for uv_set in v.texs:
-					for value in uv_set:
-						iff.insertFloat(value)
+			iff.insertNumpy(sps.vertex_array())
 			iff.exitChunk("DATA")
 			iff.exitForm("0003")
 			iff.exitForm("VTXA")
 
 			iff.insertChunk("INDX")
-			iff.insert_uint32(len(sps.tris)*3)
-			for t in sps.tris:
-				iff.insert_uint16(t.p1)
-				iff.insert_uint16(t.p2)
-				iff.insert_uint16(t.p3)
+			iff.insert_uint32(len(sps.indices)*3)
+			iff.insertNumpy(sps.index_array())
 			iff.exitChunk("INDX")
 
 			iff.exitForm("0001")
@@ -2074,6 +2284,9 @@ class SWGMesh(object):
 		iff.write(filename)	
 		
 class SWGBLendShape(object):
+	# POSN/NORM/DOT3 records: target vertex index and its delta
+	delta_dtype = numpy.dtype([('index', '<u4'), ('delta', '<f4', (3,))])
+
 	def __init__(self):
 		self.name = ""
 		self.positions = []
@@ -2081,7 +2294,28 @@ class SWGBLendShape(object):
 		self.dot3 = None
 
 	def __str__(self):
-		return f"""Name: {self.name} Positions: {str(len(self.positions))} Norms: {str(len(self.normals))} DOT3: {(str(len(self.dot3)) if self.dot3 else "N/A")}"""
+		return f"""Name: {self.name} Positions: {str(len(self.positions))} Norms: {str(len(self.normals))} DOT3: {(str(len(self.dot3)) if self.dot3 is not None else "N/A")}"""
+
+	@staticmethod
+	def make_deltas(indices, deltas):
+		values = numpy.zeros(len(indices), dtype=SWGBLendShape.delta_dtype)
+		values['index'] = indices
+		values['delta'] = numpy.asarray(deltas).reshape(-1, 3)
+		return values
+
+	@staticmethod
+	def sparse_deltas(deltas, threshold = 0.0):
+		# Records for the rows of a dense (N, 3) delta array that move more than threshold on any axis
+		deltas = numpy.asarray(deltas).reshape(-1, 3)
+		indices = numpy.flatnonzero(numpy.abs(deltas).max(axis=1, initial=0.0) > threshold)
+		return SWGBLendShape.make_deltas(indices, deltas[indices])
+
+	@staticmethod
+	def delta_array(deltas):
+		# Accepts [index, [x, y, z]] lists as well as arrays already in delta_dtype
+		if isinstance(deltas, numpy.ndarray):
+			return deltas.astype(SWGBLendShape.delta_dtype, copy=False)
+		return numpy.array([(d[0], tuple(d[1][0:3])) for d in deltas], dtype=SWGBLendShape.delta_dtype)
 
 	def __repr__(self):
 		return self.__str__()
@@ -2104,7 +2338,7 @@ class SWGPerShaderData(object):
 		self.real_shader = None
 
 	def __str__(self):
-		s = f"""Name: {self.name} pidx: {str(len(self.pidx))} nidx: {str(len(self.nidx))} DOT3: {(str(len(self.dot3)) if self.dot3 else "N/A")}"""
+		s = f"""Name: {self.name} pidx: {str(len(self.pidx))} nidx: {str(len(self.nidx))} DOT3: {(str(len(self.dot3)) if self.dot3 is not None else "N/A")}"""
 		s += "\n"
 		s += f"""UVS: {self.num_uvs} -- {', '.join( ("UVs: " + str(len(x)) + " Dim: " + str(len(x[0]))) for x in self.uvs)}"""
 		s += "\n"
@@ -2120,7 +2354,83 @@ class SWGPerShaderData(object):
 		else:
 			return self.name.split('/')[1].split('.')[0]
 
+class SkinWeights(object):
+	# Skinning weights in compressed sparse rows: vertex v owns entries
+	# offsets[v]:offsets[v + 1] of bones/weights. TWHD is the row lengths and
+	# TWDT the entries, so this is what an MGN stores, with a prefix sum.
+	__slots__ = ('offsets', 'bones', 'weights')
+	def __init__(self, counts = [], bones = [], weights = []):
+		self.offsets = numpy.concatenate(([0], numpy.cumsum(numpy.asarray(counts, dtype=numpy.int64))))
+		self.bones = numpy.asarray(bones, dtype=numpy.uint32)
+		self.weights = numpy.asarray(weights, dtype=numpy.float32)
+
+	def __str__(self):
+		return f"SkinWeights: Vertices: {self.vertex_count()} Weights: {len(self.weights)}"
+
+	def __repr__(self):
+		return self.__str__()
+
+	def vertex_count(self):
+		return len(self.offsets) - 1
+
+	def counts(self):
+		return numpy.diff(self.offsets)
+
+	def vertices(self):
+		# Vertex index of every entry
+		return numpy.repeat(numpy.arange(self.vertex_count()), self.counts())
+
+	def normalize(self):
+		# Scales every vertex's weights to sum to 1 (vertices summing to 0 are left alone)
+		vertices = self.vertices()
+		totals = numpy.bincount(vertices, weights=self.weights, minlength=self.vertex_count())[vertices]
+		self.weights = numpy.where(totals > 0, self.weights / numpy.where(totals > 0, totals, 1), self.weights).astype(numpy.float32)
+
+	def prune(self, max_influences):
+		# Keeps the max_influences heaviest bones of every vertex. Rows come out heaviest first.
+		vertices = self.vertices()
+		order = numpy.lexsort((-self.weights, vertices))
+		rank = numpy.arange(len(order)) - self.offsets[vertices[order]]
+		keep = order[rank < max_influences]
+		self.bones = self.bones[keep]
+		self.weights = self.weights[keep]
+		counts = numpy.bincount(vertices[keep], minlength=self.vertex_count())
+		self.offsets = numpy.concatenate(([0], numpy.cumsum(counts)))
+
+	def by_bone(self):
+		# {bone: (vertex indices, weights)}
+		vertices = self.vertices()
+		order = numpy.argsort(self.bones, kind='stable')
+		bones = self.bones[order]
+		starts = numpy.flatnonzero(numpy.diff(bones)) + 1
+		return {int(b[0]): (v, w) for b, v, w in zip(numpy.split(bones, starts), numpy.split(vertices[order], starts), numpy.split(self.weights[order], starts)) if len(b) > 0}
+
+	def weight_groups(self, step = 0.0):
+		# (bone, weight, vertex indices) for every distinct bone/weight pair, so a
+		# vertex group can take all vertices sharing a weight in one call. With a
+		# step, weights are first rounded to multiples of it, so near equal weights
+		# share a bucket (and the bucket value is what's returned).
+		vertices = self.vertices()
+		weights = self.weights
+		if step > 0:
+			weights = (numpy.round(weights / step) * step).astype(numpy.float32)
+		order = numpy.lexsort((weights, self.bones))
+		bones = self.bones[order]
+		weights = weights[order]
+		starts = numpy.flatnonzero((numpy.diff(bones) != 0) | (numpy.diff(weights) != 0)) + 1
+		if len(order) == 0:
+			return []
+		return [(int(bones[s]), float(weights[s]), v) for s, v in zip([0] + starts.tolist(), numpy.split(vertices[order], starts))]
+
+	def vertex_lists(self):
+		# The old per vertex [bone, weight] list form
+		offsets = self.offsets.tolist()
+		pairs = [list(p) for p in zip(self.bones.tolist(), self.weights.tolist())]
+		return [pairs[offsets[v]:offsets[v + 1]] for v in range(self.vertex_count())]
+
 class SWGMgn(object):
+	twdt_dtype = numpy.dtype([('bone', '<u4'), ('weight', '<f4')])
+
 	def __init__(self, filename, root):
 		global SWG_ROOT
 		SWG_ROOT = root
@@ -2155,7 +2465,7 @@ class SWGMgn(object):
 		self.twhd = []
 		self.twdt = []
 
-		self.vertex_weights = []
+		self.skin_weights = SkinWeights()
 
 		self.blends = []
 
@@ -2187,7 +2497,7 @@ class SWGMgn(object):
 				self.positions: {len(self.positions)}
 				self.twhd: {len(self.twhd)}
 				self.twdt: {len(self.twdt)}
-				self.dot3: {(str(len(self.dot3)) if self.dot3 else "NA")}
+				self.dot3: {(str(len(self.dot3)) if self.dot3 is not None else "NA")}
 				self.occlusions: {', '.join(str(x) for x in self.occlusions)}
 				self.occlusion_zones: {((', '.join(str(x) for x in self.occlusion_zones)) if self.occlusion_zones else "NONE")}
 				self.dynamic_hardpoints: {((', '.join(str(x) for x in self.dynamic_hardpoints)) if self.dynamic_hardpoints else "NONE")}
@@ -2202,6 +2512,10 @@ class SWGMgn(object):
 	def __repr__(self):
 		return self.__str__()
 
+	@property
+	def vertex_weights(self):
+		return self.skin_weights.vertex_lists()
+
 	def normalize_vertex_weights(self, weights):
 		for i , posn in enumerate(weights):
 			total = 0
@@ -2228,8 +2542,37 @@ class SWGMgn(object):
 		return result
 
 		
+	@staticmethod
+	def probe(filename):
+		with nsg_iff.IFF(filename=filename, use_mmap=True) as iff:
+			root = iff.build_index()
+			info = AssetInfo(filename, "SKMG")
+			version = root.find("SKMG/*")
+			if version != None:
+				info.version = version.tag
+				node = version.find("INFO")
+				if node != None:
+					iff.enterNode(node)
+					iff.read_int32()
+					iff.read_int32()
+					for name in ['skeletons', 'vertex_groups', 'positions', 'transform_weights', 'normals', 'shaders', 'blends']:
+						info.counts[name] = iff.read_int32()
+				node = version.find("SKTM")
+				if node != None:
+					iff.enterNode(node)
+					while not iff.atEndOfForm():
+						info.references.append(iff.read_string())
+				for name in version.find_all("PSDT/NAME"):
+					iff.enterNode(name)
+					info.shaders.append(iff.read_string())
+				info.references.extend(info.shaders)
+		return info
+
 	def load(self):
-		iff = nsg_iff.IFF(filename=self.filename)
+		with nsg_iff.IFF(filename=self.filename, use_mmap=True) as iff:
+			return self.read_iff(iff)
+
+	def read_iff(self, iff):
 		print(f"Name: {iff.getCurrentName()} Length: {iff.getCurrentLength()}")
 		iff.enterAnyForm()
 		version = iff.getCurrentName()
@@ -2273,79 +2616,34 @@ class SWGMgn(object):
 		iff.exitChunk("XFNM")
 
 		iff.enterChunk("POSN")  
-		self.positions = [0] * self.num_positions
-		i=0	  
-		while not iff.atEndOfForm():
-			self.positions[i] = (iff.read_float(), iff.read_float(), -iff.read_float())
-			i += 1
+		self.positions = iff.read_float_array().reshape(-1, 3)
+		self.positions[:, 2] *= -1
 		iff.exitChunk("POSN")
 
-		self.twhd = [0] * self.num_positions
-		i = 0
 		iff.enterChunk("TWHD")		
-		while not iff.atEndOfForm():
-			self.twhd[i] = iff.read_uint32()
-			i += 1
+		self.twhd = iff.read_uint32_array()
 		iff.exitChunk("TWHD")
 
 		iff.enterChunk("TWDT")	 
-		self.twdt = [[0,0.0]] * self.num_transform_weight_data   
-		i = 0
-		while not iff.atEndOfForm():
-			self.twdt[i] = [iff.read_uint32(), iff.read_float()]
-			#print(f'Twdt: {i} ({str(self.twdt[i])})')
-			#print(f"TWDT[{i}] {self.twdt[i][0]} = {self.twdt[i][1]}")
-			i += 1
+		self.twdt = iff.read_struct_array(SWGMgn.twdt_dtype)
 		iff.exitChunk("TWDT")
 
-		j = 0
-		i = 0
-		p = 0
-		self.vertex_weights = [None] * self.num_positions
-		for p, h in enumerate(self.twhd):
-			these_weights = []
-			sum=0
-			for x in range(0,h):
-				twdt = self.twdt[i]
-				sum += twdt[1]
-				these_weights.append(twdt)
-				i += 1
-			
-			# if sum != 1.0:
-			#	 print(f' *** WARN ***: Vertex Weight sum for vert: {p} != 1.0 : {sum}')
-			self.vertex_weights[p] = these_weights
-			
-			# sorted_weights = sorted(these_weights, key=lambda x: x[0])
-			# for weight in sorted_weights:				
-			#	 print(f"TWDT[{j}] {weight[0]} = {weight[1]}")
-			#	 j+=1
-		
-		#self.normalize_vertex_weights(self.vertex_weights)
-
-		#self.positions = list(zip(self.positions, self.vertex_weights))
+		self.skin_weights = SkinWeights(self.twhd, self.twdt['bone'], self.twdt['weight'])
 
 		iff.enterChunk("NORM")	 
-		self.normals = [None] * self.num_normals   
-		i = 0
-		while not iff.atEndOfForm():
-			self.normals[i] = (iff.read_float(), iff.read_float(), iff.read_float())
-			i += 1
+		self.normals = iff.read_float_array().reshape(-1, 3)
 		iff.exitChunk("NORM")
 
 		if iff.getCurrentName() == "DOT3":
 			iff.enterChunk("DOT3")	 
 			num_dot3 = iff.read_uint32()
-			self.dot3 = [None] * num_dot3   
-			i = 0
-			while not iff.atEndOfForm():
-				self.dot3[i] = [iff.read_float(), iff.read_float(), iff.read_float(), iff.read_float()]
-				i += 1
+			self.dot3 = iff.read_float_array().reshape(-1, 4)
 			iff.exitChunk("DOT3")
 
 		if iff.getCurrentName() == "HPTS":
 			data_length = iff.getCurrentLength() + 8
 			form_name = iff.getCurrentName()
-			self.binary_hardpoints = iff.read_misc(data_length)
+			self.binary_hardpoints = bytes(iff.read_misc(data_length))
 			print(f"binary_hardpoints form: {data_length} Len: {form_name}")
 
 			#iff.enterForm("HPTS")
@@ -2379,23 +2677,18 @@ class SWGMgn(object):
 
 				if iff.getCurrentName() == "POSN":
 					iff.enterChunk("POSN")
-					while not iff.atEndOfForm():
-						blt.positions.append( (iff.read_uint32(), (iff.read_float(), iff.read_float(), iff.read_float())))
+					blt.positions = iff.read_struct_array(SWGBLendShape.delta_dtype)
 					iff.exitChunk("POSN")
 
-				if iff.getCurrentName == "NORM":
+				if iff.getCurrentName() == "NORM":
 					iff.enterChunk("NORM")
-					while not iff.atEndOfForm():
-						blt.normals.append( (iff.read_uint32(), (iff.read_float(), iff.read_float(), iff.read_float())))
+					blt.normals = iff.read_struct_array(SWGBLendShape.delta_dtype)
 					iff.exitChunk("NORM")
 
 				if iff.getCurrentName() == "DOT3":
 					iff.enterChunk("DOT3")	 
 					num_dot3 = iff.read_int32()
-					blt.dot3 = []
-					#for i in range(0, num_dot3):
-					while not iff.atEndOfForm():
-						blt.dot3.append([(iff.read_int32(), (iff.read_float(), iff.read_float(), iff.read_float()))])
+					blt.dot3 = iff.read_struct_array(SWGBLendShape.delta_dtype)
 					iff.exitChunk("DOT3")
 
 				iff.exitForm("BLT ")
@@ -2453,7 +2746,7 @@ class SWGMgn(object):
 			real_shader_path = support.find_file(psdt.name, SWG_ROOT)
 			if real_shader_path:
 				psdt.full_shader_path = real_shader_path
-				psdt.real_shader = SWGShader(psdt.full_shader_path, SWG_ROOT)
+				psdt.real_shader = SHADER_CACHE.get(psdt.full_shader_path, SWG_ROOT)
 			else:
 				print(f"Couldn't locate real shader path for: {psdt.name}")
 
@@ -2483,7 +2776,7 @@ class SWGMgn(object):
 				psdt.colors = []
 				iff.enterChunk("VDCL")
 				while not iff.atEndOfForm():
-					psdt.colors.append([iff.read_byte(), iff.read_byte(), iff.read_byte(), iff.read_byte()])
+					psdt.colors.append([iff.read_uint8(), iff.read_uint8(), iff.read_uint8(), iff.read_uint8()])
 				iff.exitChunk("VDCL")
 
 			if iff.getCurrentName() == "TXCI":
@@ -2551,7 +2844,7 @@ class SWGMgn(object):
 		if iff.getCurrentName() == "TRTS":
 			data_length = iff.getCurrentLength() + 8
 			form_name = iff.getCurrentName()
-			self.binary_trts = iff.read_misc(data_length)
+			self.binary_trts = bytes(iff.read_misc(data_length))
 			print(f"binary_trts form: {data_length} Len: {form_name}")
 
 
@@ -2566,7 +2859,7 @@ class SWGMgn(object):
 
 	def write(self):
 		tris_with_no_facemap=[]
-		iff = nsg_iff.IFF(initial_size=512000)
+		iff = nsg_iff.IFF(initial_size=512000, append_only=True)
 		print(f"Name: {iff.getCurrentName()} Length: {iff.getCurrentLength()}")
 		iff.insertForm("SKMG")
 		iff.insertForm("0004")
@@ -2599,37 +2892,25 @@ class SWGMgn(object):
 		iff.exitChunk("XFNM")
 
 		iff.insertChunk("POSN")
-		for pos in self.positions:
-			#pos[0] = -pos[0]
-			iff.insertFloatVector3(pos)
+		iff.insertFloats([pos[0:3] for pos in self.positions])
 		iff.exitChunk("POSN")
 
 		iff.insertChunk("TWHD")
-		for twdt in self.twdt:
-			iff.insert_uint32(len(twdt))
+		iff.insertNumpy([len(twdt) for twdt in self.twdt], '<u4')
 		iff.exitChunk("TWHD")
 		
 		iff.insertChunk("TWDT")
-		i = 0
-		for twdt in self.twdt:
-			sorted_weights=sorted(twdt, key=lambda x: x[1], reverse=True)
-			for weight in sorted_weights:
-				iff.insert_uint32(weight[0])
-				iff.insertFloat(weight[1])
-				#print(f"TWDT[{i}] {weight[0]} = {weight[1]}")
-				i += 1
+		iff.insertStructArray('If', [weight for twdt in self.twdt for weight in sorted(twdt, key=lambda x: x[1], reverse=True)])
 		iff.exitChunk("TWDT")
 
 		iff.insertChunk("NORM")
-		for norm in self.normals:
-			iff.insertFloatVector3(norm)
+		iff.insertFloats([norm[0:3] for norm in self.normals])
 		iff.exitChunk("NORM") 
 
-		if self.dot3:
+		if self.dot3 is not None and len(self.dot3) > 0:
 			iff.insertChunk("DOT3")
 			iff.insert_uint32(len(self.dot3))
-			for dot3 in self.dot3:
-				iff.insertFloatVector4(dot3)
+			iff.insertFloats([dot3[0:4] for dot3 in self.dot3])
 			iff.exitChunk("DOT3")
 		
 		if self.binary_hardpoints:
@@ -2649,23 +2930,17 @@ class SWGMgn(object):
 				iff.exitChunk("INFO")
 
 				iff.insertChunk("POSN")
-				for p in blend.positions:
-					iff.insert_uint32(p[0])
-					iff.insertFloatVector3(p[1])
+				iff.insertNumpy(SWGBLendShape.delta_array(blend.positions))
 				iff.exitChunk("POSN")
 
 				iff.insertChunk("NORM")
-				for n in blend.normals:
-					iff.insert_uint32(n[0])
-					iff.insertFloatVector3(n[1])
+				iff.insertNumpy(SWGBLendShape.delta_array(blend.normals))
 				iff.exitChunk("NORM")
 
-				if blend.dot3:
+				if blend.dot3 is not None and len(blend.dot3) > 0:
 					iff.insertChunk("DOT3")
 					iff.insert_uint32(len(blend.dot3))
-					for n in blend.dot3:
-						iff.insert_uint32(n[0])
-						iff.insertFloatVector3(n[1])
+					iff.insertNumpy(SWGBLendShape.delta_array(blend.dot3))
 					iff.exitChunk("DOT3")
 
 				iff.exitForm("BLT ")
@@ -2715,19 +2990,16 @@ class SWGMgn(object):
 
 			iff.insertChunk("PIDX")
 			iff.insert_uint32(len(psdt.pidx))
-			for pidx in psdt.pidx:
-				iff.insert_uint32(pidx)
+			iff.insertNumpy(psdt.pidx, '<u4')
 			iff.exitChunk("PIDX")
 
 			iff.insertChunk("NIDX")
-			for nidx in psdt.nidx:
-				iff.insert_uint32(nidx)
+			iff.insertNumpy(psdt.nidx, '<u4')
 			iff.exitChunk("NIDX")
 
-			if psdt.dot3:
+			if psdt.dot3 is not None and len(psdt.dot3) > 0:
 				iff.insertChunk("DOT3")
-				for dot3 in psdt.dot3:
-					iff.insert_uint32(dot3)
+				iff.insertNumpy(psdt.dot3, '<u4')
 				iff.exitChunk("DOT3")
 
 			if len(psdt.uvs) > 0:
@@ -2740,9 +3012,9 @@ class SWGMgn(object):
 				iff.insertForm("TCSF")
 				for uv_set in psdt.uvs:
 					iff.insertChunk("TCSD")
-					for uv in uv_set:
-						iff.insertFloat(uv[0])
-						iff.insertFloat(1 - uv[1]) 
+					uvs = numpy.array([uv[0:2] for uv in uv_set], dtype=numpy.float64).reshape(-1, 2)
+					uvs[:, 1] = 1 - uvs[:, 1]
+					iff.insertFloats(uvs)
 					iff.exitChunk("TCSD")
 				iff.exitForm("TCSF")
 
@@ -2775,8 +3047,7 @@ class SWGMgn(object):
 				for prim in psdt.prims:
 					iff.insertChunk("ITL ")
 					iff.insert_uint32(len(prim) // 3)
-					for value in prim:
-						iff.insert_uint32(value)
+					iff.insertNumpy(prim, '<u4')
 					iff.exitChunk("ITL ")
 			iff.exitForm("PRIM")
 			
@@ -0,0 +1,180 @@
+import os, struct, zlib, threading, tempfile, builtins, collections
+
+# TRE (TreeFile) archives hold the client's assets. Layout (little-endian):
+#   header:  'EERT', version, file count, TOC offset, TOC compressor, TOC size,
+#            name block compressor, name block size, uncompressed name block size
+#   TOC:     per file crc, length, offset, compressor, compressed length, name offset
+#   names:   null terminated file names the TOC entries point into
+# Compressor 0 means stored, 2 means zlib.
+
+COMPRESSOR_NONE = 0
+COMPRESSOR_ZLIB = 2
+
+header_struct = struct.Struct('<4s4s7I')
+entry_struct = struct.Struct('<6I')
+
+class TreEntry():
+	__slots__ = ('name', 'offset', 'length', 'compressor', 'compressed_length')
+	def __init__(self, name, offset, length, compressor, compressed_length):
+		self.name = name
+		self.offset = offset
+		self.length = length
+		self.compressor = compressor
+		self.compressed_length = compressed_length
+
+	def __str__(self):
+		return f"{self.name} Offset: {self.offset} Length: {self.length} Compressor: {self.compressor}"
+
+	def __repr__(self):
+		return self.__str__()
+
+class TreArchive():
+	def __init__(self, path, cache_size = 32 * 1024 * 1024):
+		self.path = os.path.abspath(path)
+		self.entries = {}
+		self.cache = collections.OrderedDict()
+		self.cache_size = cache_size
+		self.cached_bytes = 0
+		self.lock = threading.Lock()
+		self.file = builtins.open(self.path, 'rb')
+		# Size and mtime of the archive this TOC was read from; a patched .tre
+		# gets a different stamp, so nothing extracted from the old one is reused.
+		self.stamp = file_stamp(os.fstat(self.file.fileno()))
+		self.read_toc()
+
+	def __str__(self):
+		return f"TRE: {self.path} Files: {len(self.entries)} Cached: {len(self.cache)} ({self.cached_bytes} bytes)"
+
+	def __repr__(self):
+		return self.__str__()
+
+	def read_block(self, offset, size, compressor, length):
+		self.file.seek(offset)
+		data = self.file.read(size)
+		if compressor == COMPRESSOR_ZLIB:
+			return zlib.decompress(data)
+		elif compressor != COMPRESSOR_NONE:
+			raise ValueError(f"{self.path}: unsupported compressor {compressor}")
+		return data[:length]
+
+	def read_toc(self):
+		self.file.seek(0)
+		token, version, count, toc_offset, toc_compressor, toc_size, name_compressor, name_size, name_length = header_struct.unpack(self.file.read(header_struct.size))
+		if token != b'EERT':
+			raise ValueError(f"{self.path} is not a TRE archive")
+		version = version[::-1].decode('ascii')
+		if version not in ["0004", "0005", "0006"]:
+			print(f"Warning: {self.path} has untested TRE version: {version}")
+
+		toc_length = count * entry_struct.size
+		if toc_compressor == COMPRESSOR_NONE:
+			toc_size = toc_length
+		toc = self.read_block(toc_offset, toc_size, toc_compressor, toc_length)
+		names = self.read_block(toc_offset + toc_size, name_size if name_compressor != COMPRESSOR_NONE else name_length, name_compressor, name_length)
+
+		for crc, length, offset, compressor, compressed_length, name_offset in entry_struct.iter_unpack(toc[:toc_length]):
+			end = names.find(b'\0', name_offset)
+			name = names[name_offset:end if end != -1 else len(names)].decode('ascii', 'replace')
+			self.entries[normalize(name)] = TreEntry(name, offset, length, compressor, compressed_length)
+
+	def find(self, relative_path):
+		entry = self.entries.get(normalize(relative_path))
+		if entry == None:
+			return None
+		return os.path.join(self.path, *entry.name.split('/'))
+
+	def read(self, name):
+		key = normalize(name)
+		entry = self.entries.get(key)
+		if entry == None:
+			return None
+
+		with self.lock:
+			data = self.cache.get(key)
+			if data != None:
+				self.cache.move_to_end(key)
+				return data
+
+			size = entry.compressed_length if entry.compressor != COMPRESSOR_NONE else entry.length
+			data = self.read_block(entry.offset, size, entry.compressor, entry.length)
+
+			if len(data) <= self.cache_size:
+				self.cache[key] = data
+				self.cached_bytes += len(data)
+				while self.cached_bytes > self.cache_size:
+					old_key, old_data = self.cache.popitem(last=False)
+					self.cached_bytes -= len(old_data)
+		return data
+
+	def close(self):
+		with self.lock:
+			self.cache.clear()
+			self.cached_bytes = 0
+			self.file.close()
+
+def file_stamp(st):
+	return f"{st.st_size:x}_{st.st_mtime_ns:x}"
+
+def normalize(name):
+	return name.replace('\\', '/').strip('/').lower()
+
+# Open archives by absolute path. Paths handed out by find() look like
+# <archive path>/<name inside archive> so they pass through find_file and the
+# loaders like any other path.
+archives = {}
+
+def is_archive(path):
+	return path.lower().endswith('.tre') and os.path.isfile(path)
+
+def get_archive(path):
+	path = os.path.abspath(path)
+	archive = archives.get(path)
+	if archive != None and archive.stamp != file_stamp(os.stat(path)):
+		# Patched since it was opened: the TOC is stale too
+		archive.close()
+		archive = None
+	if archive == None:
+		archive = TreArchive(path)
+		archives[path] = archive
+	return archive
+
+def split_path(path):
+	# Returns (archive, name inside it) for a path into an open archive.
+	path = os.path.abspath(path)
+	for archive_path, archive in archives.items():
+		if path.startswith(archive_path + os.sep):
+			return archive, path[len(archive_path) + 1:]
+	return None, None
+
+def is_archive_path(path):
+	return split_path(path)[0] != None
+
+def read_file(path):
+	archive, name = split_path(path)
+	if archive == None:
+		with builtins.open(path, 'rb') as file:
+			return file.read()
+	return archive.read(name)
+
+def extract(path):
+	# For consumers that need a real file (images), writes the archived file to
+	# a temp mirror once and returns that path. Loose files are returned as is.
+	# The mirror is keyed by the archive's stamp, so a patched archive never
+	# serves files extracted from the previous one.
+	archive, name = split_path(path)
+	if archive == None:
+		return path
+	out_path = os.path.join(tempfile.gettempdir(), "swg_tre", f"{os.path.basename(archive.path)}_{archive.stamp}", *normalize(name).split('/'))
+	if not os.path.exists(out_path):
+		os.makedirs(os.path.dirname(out_path), exist_ok=True)
+		# Written under a temp name first so a half written file is never picked up
+		temp_path = out_path + ".tmp"
+		with builtins.open(temp_path, 'wb') as file:
+			file.write(archive.read(name))
+		os.replace(temp_path, out_path)
+	return out_path
+
+def close_all():
+	for archive in archives.values():
+		archive.close()
+	archives.clear()
@@ -20,6 +20,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import numpy
+
 TextureCoordinateSetCountShift = 8
 TextureCoordinateSetCountMask = 15
 
@@ -169,3 +171,42 @@ def setTextureCoordinateSetDimension(flags, textureCoordinateSet, dimension):
     shift = (TextureCoordinateSetDimensionBaseShift + (textureCoordinateSet * TextureCoordinateSetDimensionPerSetShift))
     flags = (flags & ~((TextureCoordinateSetDimensionMask) << shift)) | ((dimension - TextureCoordinateSetDimensionAdjustment) << shift)
     return flags
+
+def hasDOT3(flags):
+    num_uv_sets = getNumberOfTextureCoordinateSets(flags)
+    return (num_uv_sets > 0) and (getTextureCoordinateSetDimension(flags, num_uv_sets - 1) == 4)
+
+compiled_dtypes = {}
+
+def getDtype(flags):
+    # Structured dtype of one vertex in a VTXA DATA chunk, in file order. The
+    # last texture coordinate set is DOT3 when it has 4 dimensions.
+    dtype = compiled_dtypes.get(flags)
+    if dtype != None:
+        return dtype
+
+    fields = []
+    if hasPosition(flags):
+        fields.append(('position', '<f4', (3,)))
+    if isTransformed(flags):
+        fields.append(('w', '<f4'))
+    if hasNormal(flags):
+        fields.append(('normal', '<f4', (3,)))
+    if hasPointSize(flags):
+        fields.append(('pointSize', '<f4'))
+    if hasColor0(flags):
+        fields.append(('color0', 'u1', (4,))) # BGRA
+    if hasColor1(flags):
+        fields.append(('color1', 'u1', (4,))) # BGRA
+
+    num_uv_sets = getNumberOfTextureCoordinateSets(flags)
+    if hasDOT3(flags):
+        num_uv_sets -= 1
+    for i in range(0, num_uv_sets):
+        fields.append((f'uv{i}', '<f4', (getTextureCoordinateSetDimension(flags, i),)))
+    if hasDOT3(flags):
+        fields.append(('dot3', '<f4', (4,)))
+
+    dtype = numpy.dtype(fields)
+    compiled_dtypes[flags] = dtype
+    return dtype
@@ -0,0 +1,4 @@
+import os, sys
+
+# The add-on is imported as the io_scene_swg package from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
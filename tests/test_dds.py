@@ -0,0 +1,67 @@
+import os, struct, zlib, importlib.util
+import pytest
+
+# dds.py only needs NumPy, so it's loaded on its own rather than through the
+# package, whose __init__ needs Blender
+spec = importlib.util.spec_from_file_location("dds", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "io_scene_swg", "dds.py"))
+dds = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(dds)
+
+def header(width, height, fourcc):
+	data = bytearray(128)
+	data[0:4] = b'DDS '
+	struct.pack_into('<2I', data, 12, height, width)
+	struct.pack_into('<I4s', data, 80, dds.DDPF_FOURCC, fourcc)
+	return bytes(data)
+
+def color_indices(indices):
+	bits = 0
+	for k, index in enumerate(indices):
+		bits |= index << (2 * k)
+	return bits
+
+def test_dxt1_four_color():
+	# Red and blue endpoints, pixel k uses palette entry k % 4
+	block = struct.pack('<HHI', 0xF800, 0x001F, color_indices([k % 4 for k in range(16)]))
+	pixels = dds.decode(header(4, 4, b'DXT1') + block)
+	assert pixels.shape == (4, 4, 4)
+	assert pixels[0].tolist() == [[255, 0, 0, 255], [0, 0, 255, 255], [170, 0, 85, 255], [85, 0, 170, 255]]
+	assert (pixels == pixels[0]).all()
+
+def test_dxt1_three_color_has_transparent_black():
+	block = struct.pack('<HHI', 0x001F, 0xF800, color_indices([k % 4 for k in range(16)]))
+	pixels = dds.decode(header(4, 4, b'DXT1') + block)
+	assert pixels[0].tolist() == [[0, 0, 255, 255], [255, 0, 0, 255], [127, 0, 127, 255], [0, 0, 0, 0]]
+
+def test_dxt5_interpolated_alpha():
+	alpha_bits = 0
+	for k in range(16):
+		alpha_bits |= (k % 8) << (3 * k)
+	alpha = bytes([255, 0]) + alpha_bits.to_bytes(6, 'little')
+	white = struct.pack('<HHI', 0xFFFF, 0xFFFF, 0)
+	# 6x3 crops a 2x1 grid of blocks; the second block is opaque black
+	black = bytes([255, 255]) + bytes(6) + struct.pack('<HHI', 0, 0, 0)
+	pixels = dds.decode(header(6, 3, b'DXT5') + alpha + white + black)
+	assert pixels.shape == (3, 6, 4)
+	assert pixels[0, :4, 3].tolist() == [255, 0, 218, 182]
+	assert pixels[1, :4, 3].tolist() == [145, 109, 72, 36]
+	assert pixels[0, :4, :3].tolist() == [[255, 255, 255]] * 4
+	assert pixels[0, 4:].tolist() == [[0, 0, 0, 255]] * 2
+
+def test_unsupported_fourcc():
+	with pytest.raises(dds.UnsupportedFormat):
+		dds.decode(header(4, 4, b'ATI2') + bytes(16))
+
+def test_write_png(tmp_path):
+	block = struct.pack('<HHI', 0xF800, 0x001F, 0)
+	dds_path = tmp_path / "red.dds"
+	png_path = tmp_path / "red.png"
+	dds_path.write_bytes(header(4, 4, b'DXT1') + block)
+	dds.convert(str(dds_path), str(png_path))
+
+	data = png_path.read_bytes()
+	assert data[:8] == b'\x89PNG\r\n\x1a\n'
+	assert struct.unpack('>2I', data[16:24]) == (4, 4)
+	length = struct.unpack('>I', data[33:37])[0]
+	rows = zlib.decompress(data[41:41 + length])
+	assert rows == (b'\x00' + bytes([255, 0, 0, 255]) * 4) * 4
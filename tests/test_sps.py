@@ -0,0 +1,37 @@
+import numpy
+import pytest
+
+# swg_types needs Blender's modules; run these with Blender's Python
+pytest.importorskip("bpy")
+from io_scene_swg import swg_types, vertex_buffer_format
+
+def uv_flags(num_uv_sets):
+	flags = vertex_buffer_format.setPosition(0, True)
+	flags = vertex_buffer_format.setNormal(flags, True)
+	flags = vertex_buffer_format.setNumberOfTextureCoordinateSets(flags, num_uv_sets)
+	for i in range(num_uv_sets):
+		flags = vertex_buffer_format.setTextureCoordinateSetDimension(flags, i, 2)
+	return flags
+
+def test_missing_uv_sets_are_written_as_zeros():
+	# The material declares two UV sets but the mesh only had one UV layer
+	sps = swg_types.SPS(0, "shader/a.sht", uv_flags(2))
+	sps.positions = numpy.array([[1, 2, 3], [4, 5, 6]], dtype=numpy.float32)
+	sps.normals = numpy.array([[0, 1, 0], [0, 0, 1]], dtype=numpy.float32)
+	sps.uvs = [numpy.array([[0.25, 0.5], [0.75, 1.0]], dtype=numpy.float32)]
+
+	vertices = sps.vertex_array()
+	assert vertices.dtype.itemsize == 4 * (3 + 3 + 2 + 2)
+	assert vertices['uv0'].tolist() == [[0.25, 0.5], [0.75, 1.0]]
+	assert vertices['uv1'].tolist() == [[0.0, 0.0], [0.0, 0.0]]
+
+	read = swg_types.SPS(0, "shader/a.sht", sps.flags)
+	read.set_vertex_array(vertices)
+	assert len(read.uvs) == 2
+	assert read.positions.tolist() == sps.positions.tolist()
+
+def test_default_sps_is_empty():
+	sps = swg_types.SPS()
+	assert sps.vertex_count() == 0
+	assert sps.indices.shape == (0, 3)
+	assert sps.tris == []